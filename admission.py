@@ -0,0 +1,117 @@
+# Admission control: weighted fair queuing of pipeline work per tenant
+# (bearer token) in front of bounded ingest and LLM slot pools.
+
+import contextvars, hashlib, math, threading, time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import metrics
+
+current_tenant: contextvars.ContextVar = contextvars.ContextVar("tenant", default="anonymous")
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, pool: str, retry_after: int):
+        super().__init__(f"{pool} queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class QueueTimeout(Exception):
+    pass
+
+
+def tenant_id(authorization: Optional[str]) -> str:
+    """Stable tenant key for a bearer token (hashed so tokens never reach logs or metrics)."""
+    if not authorization:
+        return "anonymous"
+    token = authorization.split(" ", 1)[-1].strip()
+    return hashlib.sha256(token.encode()).hexdigest()[:12]
+
+
+class _Waiter:
+    __slots__ = ("tag", "seq", "tenant", "granted")
+
+    def __init__(self, tag: float, seq: int, tenant: str):
+        self.tag, self.seq, self.tenant, self.granted = tag, seq, tenant, False
+
+
+class FairGate:
+    """At most ``capacity`` holders; waiters are served in start-time fair order.
+
+    Each tenant's requests get virtual tags advancing by ``cost / weight``,
+    starting no earlier than the current virtual time, so a tenant that
+    queues 100 LLM calls cannot push a newcomer's single call behind all
+    of them. ``max_queue`` bounds the waiters; beyond it acquire() raises
+    AdmissionRejected with a Retry-After estimate.
+    """
+
+    def __init__(self, name: str, capacity: int, max_queue: Optional[int] = None,
+                 weights: Optional[Dict[str, float]] = None):
+        self.name = name
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.weights = weights or {}
+        self.in_flight = 0
+        self.vtime = 0.0
+        self._last_tag: Dict[str, float] = {}
+        self._waiters = []
+        self._seq = 0
+        self._hold_ewma = 1.0
+        self._cond = threading.Condition()
+        labels = {"pool": name}
+        self._depth = metrics.gauge("admission_queue_depth", labels)
+        self._busy = metrics.gauge("admission_in_flight", labels)
+        self._wait = metrics.histogram("admission_queue_wait_seconds", labels)
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(len(self._waiters) * self._hold_ewma / max(1, self.capacity)))
+
+    def _grant_next(self):
+        while self.in_flight < self.capacity and self._waiters:
+            w = min(self._waiters, key=lambda x: (x.tag, x.seq))
+            self._waiters.remove(w)
+            w.granted = True
+            self.vtime = max(self.vtime, w.tag)
+            self.in_flight += 1
+        self._depth.set(len(self._waiters))
+        self._busy.set(self.in_flight)
+        self._cond.notify_all()
+
+    def acquire(self, tenant: str, cost: float = 1.0, timeout: Optional[float] = None):
+        start = time.monotonic()
+        with self._cond:
+            if self.max_queue is not None and len(self._waiters) >= self.max_queue:
+                metrics.counter("admission_rejected_total", {"pool": self.name}).inc()
+                raise AdmissionRejected(self.name, self.retry_after())
+            weight = self.weights.get(tenant, 1.0)
+            tag = max(self.vtime, self._last_tag.get(tenant, 0.0)) + cost / weight
+            self._last_tag[tenant] = tag
+            self._seq += 1
+            w = _Waiter(tag, self._seq, tenant)
+            self._waiters.append(w)
+            self._grant_next()
+            end = None if timeout is None else start + timeout
+            while not w.granted:
+                left = None if end is None else end - time.monotonic()
+                if left is not None and left <= 0:
+                    self._waiters.remove(w)
+                    self._depth.set(len(self._waiters))
+                    metrics.counter("admission_timeouts_total", {"pool": self.name}).inc()
+                    raise QueueTimeout(f"timed out waiting in the {self.name} queue")
+                self._cond.wait(left)
+        self._wait.observe(time.monotonic() - start)
+        return time.monotonic()
+
+    def release(self, acquired_at: float):
+        with self._cond:
+            self.in_flight -= 1
+            self._hold_ewma = 0.8 * self._hold_ewma + 0.2 * (time.monotonic() - acquired_at)
+            self._grant_next()
+
+    @contextmanager
+    def slot(self, tenant: Optional[str] = None, cost: float = 1.0, timeout: Optional[float] = None):
+        acquired_at = self.acquire(tenant or current_tenant.get(), cost, timeout)
+        try:
+            yield
+        finally:
+            self.release(acquired_at)
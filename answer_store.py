@@ -0,0 +1,134 @@
+# Exact-match answer store: LLM answers keyed by a hash of the prompt, the
+# model and its generation parameters, in SQLite so every worker and every
+# restart reuses them.
+
+import hashlib, json, logging, os, sqlite3, threading, time
+from typing import Iterable, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    answer TEXT NOT NULL,
+    model TEXT NOT NULL,
+    llm_seconds REAL NOT NULL,     -- what generating it cost
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used);
+CREATE TABLE IF NOT EXISTS answer_docs (
+    doc_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (doc_id, key)
+);
+"""
+
+
+class AnswerStore:
+    """Answers expire ``ttl`` seconds after they were generated. Every
+    ``prune_every`` stores, expired answers are deleted and the least
+    recently used ones beyond ``max_entries``. Answers are tagged with the
+    documents their context came from, so ``invalidate(doc_id)`` drops them
+    when a document changes or is deleted."""
+
+    def __init__(self, path: str, model: str, params: Optional[dict] = None, ttl: float = 7 * 86400.0,
+                 max_entries: int = 100_000, prune_every: int = 200):
+        self.path = path
+        self.model = model
+        self.params = json.dumps(params or {}, sort_keys=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._stores = 0
+        self._conn().executescript(SCHEMA)
+        self.prune()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # A connection inherited through fork (serve.py workers) must not be reused
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def key(self, prompt: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{self.params}\0{prompt}".encode("utf-8", "surrogatepass")).hexdigest()
+
+    def get(self, prompt: str) -> Optional[str]:
+        key, now = self.key(prompt), time.time()
+        try:
+            db = self._conn()
+            row = db.execute("SELECT answer, llm_seconds FROM answers WHERE key = ? AND created_at > ?",
+                             (key, now - self.ttl)).fetchone()
+            if row is not None:
+                db.execute("UPDATE answers SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            logger.warning(f"Answer store read failed: {e}")
+            return None
+        metrics.counter("answer_store_total", {"outcome": "hit" if row else "miss"}).inc()
+        if row is None:
+            return None
+        metrics.counter("answer_store_saved_llm_seconds_total").inc(row[1])
+        return row[0]
+
+    def put(self, prompt: str, answer: str, llm_seconds: float, doc_ids: Iterable[str] = ()):
+        key, now = self.key(prompt), time.time()
+        try:
+            db = self._conn()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute("INSERT OR REPLACE INTO answers (key, answer, model, llm_seconds, created_at, last_used) "
+                           "VALUES (?, ?, ?, ?, ?, ?)", (key, answer, self.model, llm_seconds, now, now))
+                db.executemany("INSERT OR IGNORE INTO answer_docs (doc_id, key) VALUES (?, ?)",
+                               [(d, key) for d in set(doc_ids)])
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Answer store write failed: {e}")
+            return
+        self._stores += 1
+        if self._stores % self.prune_every == 0:
+            self.prune()
+
+    def invalidate(self, doc_id: str) -> int:
+        """Drop every answer whose context came from ``doc_id``; returns how many."""
+        try:
+            db = self._conn()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                n = db.execute("DELETE FROM answers WHERE key IN (SELECT key FROM answer_docs WHERE doc_id = ?)",
+                               (doc_id,)).rowcount
+                db.execute("DELETE FROM answer_docs WHERE doc_id = ?", (doc_id,))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Answer store invalidation of {doc_id} failed: {e}")
+            return 0
+        if n:
+            metrics.counter("answer_store_invalidated_total").inc(n)
+        return n
+
+    def prune(self):
+        try:
+            db = self._conn()
+            expired = db.execute("DELETE FROM answers WHERE created_at <= ?", (time.time() - self.ttl,)).rowcount
+            evicted = db.execute(
+                "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_used DESC "
+                "LIMIT -1 OFFSET ?)", (self.max_entries,)).rowcount
+            if expired or evicted:
+                db.execute("DELETE FROM answer_docs WHERE key NOT IN (SELECT key FROM answers)")
+                logger.info(f"Answer store: {expired} expired, {evicted} evicted")
+            metrics.gauge("answer_store_entries").set(db.execute("SELECT COUNT(*) FROM answers").fetchone()[0])
+        except sqlite3.Error as e:
+            logger.warning(f"Answer store pruning failed: {e}")
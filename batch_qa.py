@@ -0,0 +1,190 @@
+# Offline batch question answering through the pipeline in main.py, for QA
+# regression runs and reporting jobs.
+#
+#   python batch_qa.py items.jsonl --out answers.jsonl --llm-parallel 16
+#
+# Each input line is {"id": ..., "documents": "<url or path>", "questions": [...]}
+# ("doc_id" may name a stored document instead of "documents"). Items run
+# concurrently in one process, so the document store, the ingest coalescing
+# and the loaded models are shared across them; LLM calls are bounded by
+# --llm-parallel (MAX_INFLIGHT_LLM). With more items in flight than LLM slots,
+# ingestion and retrieval for the next items overlap with answer generation
+# and the LLM slots stay busy, which is what bounds throughput.
+#
+# One JSON line per finished item is appended to --out, with per-stage
+# timings. Rerunning the same command skips items already answered in full;
+# failed or partially answered items run again.
+
+import argparse, json, os, sys, time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+import metrics
+from deadline import PARTIAL_MARKER, Deadline
+from pdf_buffer import PdfBuffer
+
+TENANT = "batch"
+STAGES = ("ingest", "embed", "retrieve", "answer", "total")
+
+main = None  # the app module, imported once its limits are set
+
+
+def is_url(source: str) -> bool:
+    return source.startswith(("http://", "https://"))
+
+
+def load_items(path: str) -> List[dict]:
+    base, items = os.path.dirname(os.path.abspath(path)), []
+    with open(path) as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            item.setdefault("id", n)
+            source = item.get("documents")
+            if source and not is_url(source):
+                item["documents"] = os.path.join(base, source)
+            items.append(item)
+    return items
+
+
+def load_checkpoint(path: str) -> set:
+    done = set()
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by the interruption
+                if entry.get("status") == "ok":
+                    done.add(json.dumps(entry["id"]))
+    return done
+
+
+def ingest(item: dict, deadline: Deadline):
+    if item.get("doc_id"):
+        doc = main.doc_store.get(item["doc_id"])
+        if doc is None:
+            raise ValueError(f"unknown doc_id {item['doc_id']}")
+        return doc
+    source = item["documents"]
+    if is_url(source):
+        return main.ingest_document(source, deadline, TENANT, owned=False)
+    with main.ingest_gate.slot(TENANT, timeout=deadline.timeout()), PdfBuffer.open(source) as buf:
+        return main.ingest_content(lambda: buf, buf.sha256, deadline, source)
+
+
+def run_item(item: dict, timeout: Optional[float]) -> dict:
+    main.current_tenant.set(TENANT)
+    main.current_priority.set("batch")
+    deadline = Deadline(timeout)
+    result = {"id": item["id"], "documents": item.get("documents") or item.get("doc_id")}
+    timings: Dict[str, float] = {}
+    start = time.monotonic()
+    try:
+        doc = ingest(item, deadline)
+        timings["ingest"] = time.monotonic() - start
+        result["doc_id"] = doc.doc_id
+        answers = main.answer_questions(doc, list(item.get("questions", [])), deadline, timings=timings)
+        result["answers"] = answers
+        failed = sum(1 for a in answers if a.startswith((PARTIAL_MARKER, "Error generating answer")))
+        result["status"] = "partial" if failed else "ok"
+        if deadline.degraded:
+            result["degraded"] = deadline.degraded
+    except Exception as e:
+        result.update(status="error", error=getattr(e, "detail", None) or str(e) or type(e).__name__)
+    timings["total"] = time.monotonic() - start
+    result["timings"] = {k: round(v, 3) for k, v in timings.items()}
+    return result
+
+
+def llm_calls() -> float:
+    return metrics.counter("llm_calls_total", {"outcome": "ok"}).value
+
+
+def report(totals: dict, elapsed: float) -> str:
+    elapsed = max(elapsed, 1e-9)
+    return (f"{totals['items'] / elapsed:.2f} items/s, {totals['questions'] / elapsed:.2f} questions/s, "
+            f"{totals['llm_calls'] / elapsed:.2f} LLM calls/s")
+
+
+def run(args) -> int:
+    global main
+    # Limits are read when the app module is imported
+    llm_parallel = args.llm_parallel or int(os.getenv("MAX_INFLIGHT_LLM", "8"))
+    concurrency = args.concurrency or 2 * llm_parallel
+    os.environ["MAX_INFLIGHT_LLM"] = str(llm_parallel)
+    os.environ["MAX_QUEUE_DEPTH"] = str(max(concurrency, int(os.getenv("MAX_QUEUE_DEPTH", "32"))))
+    import main as app
+    main = app
+
+    done = load_checkpoint(args.out)
+    items = load_items(args.input)
+    todo = [it for it in items if json.dumps(it["id"]) not in done]
+    print(f"{len(items)} items, {len(items) - len(todo)} already answered, {len(todo)} to go "
+          f"({concurrency} in flight, {main.MAX_INFLIGHT_LLM} LLM calls in parallel)")
+    if not todo:
+        return 0
+
+    totals = dict.fromkeys(("items", "questions", "ok", "partial", "error"), 0)
+    stage_sums = dict.fromkeys(STAGES, 0.0)
+    calls_before, start = llm_calls(), time.monotonic()
+    last_report = start
+    pool = ThreadPoolExecutor(concurrency, thread_name_prefix="batch")
+    pending = {pool.submit(run_item, it, args.timeout) for it in todo}
+    try:
+        with open(args.out, "a") as out:
+            while pending:
+                finished, pending = wait(pending, timeout=args.report_every, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    out.write(json.dumps(result) + "\n")
+                    totals[result["status"]] += 1
+                    totals["items"] += 1
+                    totals["questions"] += len(result.get("answers", []))
+                    for stage in STAGES:
+                        stage_sums[stage] += result["timings"].get(stage, 0.0)
+                    if result["status"] == "error":
+                        print(f"FAILED {result['id']}: {result['error']}", file=sys.stderr)
+                out.flush()
+                now = time.monotonic()
+                if now - last_report >= args.report_every or not pending:
+                    last_report = now
+                    totals["llm_calls"] = llm_calls() - calls_before
+                    print(f"[{totals['items']}/{len(todo)}] {report(totals, now - start)}")
+    except KeyboardInterrupt:
+        pool.shutdown(wait=False, cancel_futures=True)
+        print(f"Interrupted; rerun the same command to resume ({args.out})", file=sys.stderr)
+        os._exit(130)  # items in flight are not waited for; they run again on resume
+    pool.shutdown()
+    if main.access_log:
+        main.access_log.flush()
+
+    elapsed = time.monotonic() - start
+    totals["llm_calls"] = llm_calls() - calls_before
+    summary = {"items": totals["items"], "answered": totals["ok"], "partial": totals["partial"],
+               "failed": totals["error"], "questions": totals["questions"], "llm_calls": totals["llm_calls"],
+               "seconds": round(elapsed, 2), "items_per_s": round(totals["items"] / elapsed, 3),
+               "questions_per_s": round(totals["questions"] / elapsed, 3),
+               "llm_calls_per_s": round(totals["llm_calls"] / elapsed, 3),
+               "mean_stage_seconds": {s: round(v / max(1, totals["items"]), 3) for s, v in stage_sums.items()}}
+    print(f"{totals['ok']} answered, {totals['partial']} partial, {totals['error']} failed "
+          f"in {elapsed:.1f}s: {report(totals, elapsed)}")
+    print("mean seconds per item: " + ", ".join(f"{s} {v}" for s, v in summary["mean_stage_seconds"].items()))
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if totals["error"] or totals["partial"] else 0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Answer a JSONL file of (document, questions) items")
+    ap.add_argument("input", help="JSONL of {id, documents | doc_id, questions}")
+    ap.add_argument("--out", required=True, help="JSONL results, appended per item (also the checkpoint)")
+    ap.add_argument("--llm-parallel", type=int, default=0, help="LLM calls in flight (default: MAX_INFLIGHT_LLM)")
+    ap.add_argument("--concurrency", type=int, default=0, help="items in flight (default: 2 x LLM parallelism)")
+    ap.add_argument("--timeout", type=float, default=0, help="per-item budget in seconds (0: none)")
+    ap.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    ap.add_argument("--summary", help="write throughput and mean stage timings as JSON")
+    sys.exit(run(ap.parse_args()))
@@ -0,0 +1,65 @@
+# Compare PDF extraction backends: pages/sec and extracted character yield.
+#
+#   python bench_extract.py                     # synthetic corpus (loadtest.make_pdf)
+#   python bench_extract.py --corpus ./pdfs     # every *.pdf in a directory
+
+import argparse, glob, json, os, time
+from typing import Dict, List, Tuple
+
+from extractors import ExtractionChain, available_backends, is_usable
+from loadtest import make_pdf, policy_pages
+
+
+def load_corpus(path: str, sizes: List[int]) -> List[Tuple[str, bytes]]:
+    if path:
+        corpus = []
+        for name in sorted(glob.glob(os.path.join(path, "*.pdf"))):
+            with open(name, "rb") as f:
+                corpus.append((os.path.basename(name), f.read()))
+        return corpus
+    return [(f"synthetic-{n}p.pdf", make_pdf(policy_pages(n, seed=n))) for n in sizes]
+
+
+def run(order: List[str], corpus: List[Tuple[str, bytes]], repeat: int) -> Dict[str, float]:
+    chain = ExtractionChain(order)
+    pages = chars = empty = fallbacks = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, data in corpus:
+            with chain.open(data) as doc:
+                for i in range(doc.page_count()):
+                    text = doc.page_text(i)
+                    pages += 1
+                    chars += len(text)
+                    empty += not is_usable(text)
+                fallbacks += doc.fallbacks
+    elapsed = time.perf_counter() - start
+    return {"backends": "+".join(chain.names), "pages": pages // repeat,
+            "pages_per_sec": round(pages / elapsed, 1), "chars": chars // repeat,
+            "unusable_pages": empty // repeat, "fallback_pages": fallbacks // repeat}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="PDF extraction backend benchmark")
+    ap.add_argument("--corpus", help="directory of PDFs (default: synthetic policies)")
+    ap.add_argument("--sizes", default="10,50,200", help="synthetic corpus page counts")
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--chain", default="pdfium,pypdf,pypdf2,pdfminer", help="fallback order to benchmark")
+    ap.add_argument("--out", help="write results as JSON")
+    args = ap.parse_args()
+
+    corpus = load_corpus(args.corpus, [int(s) for s in args.sizes.split(",")])
+    print(f"corpus: {len(corpus)} PDFs, {sum(len(d) for _, d in corpus) / 1e6:.1f} MB")
+    results = [run([name], corpus, args.repeat) for name in available_backends()]
+    results.append(run(args.chain.split(","), corpus, args.repeat))
+    print(f"{'backends':<32}{'pages/s':>10}{'chars':>12}{'unusable':>10}{'fallback':>10}")
+    for r in results:
+        print(f"{r['backends']:<32}{r['pages_per_sec']:>10}{r['chars']:>12}"
+              f"{r['unusable_pages']:>10}{r['fallback_pages']:>10}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
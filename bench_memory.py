@@ -0,0 +1,126 @@
+# Peak RSS of PDF extraction per MB of PDF: the old in-memory path (whole
+# body as bytes, a BytesIO copy, PyPDF2 with its object cache, one
+# concatenated text string) against the current one: the PDF spooled to a temp
+# file and extracted by the service's own DocumentProcessor.extract_pages
+# (mmap'd read-only, page objects released as extraction goes). Peak
+# anonymous memory is reported too: mapped file pages count towards RSS but
+# the kernel can drop them, so anonymous memory is what actually runs a
+# container out, and it is where the mmap path saves: peak RSS also counts
+# the mapped file, so it falls by much less.
+#
+#   python bench_memory.py --pages 100,400 --image-kb 200
+#   python bench_memory.py --corpus ./pdfs
+#
+# Every measurement runs in a fresh interpreter so peaks do not carry over.
+
+import argparse, glob, io, json, os, subprocess, sys, tempfile, threading
+
+
+def rss_mb(field: str) -> float:
+    # VmHWM (peak) belongs to the address space, so unlike ru_maxrss it is not
+    # inherited from the parent that generated the corpus
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError(f"{field} not in /proc/self/status (Linux only)")
+
+
+class AnonPeak(threading.Thread):
+    # The kernel keeps no high-water mark for anonymous memory alone; sample it
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.base = self.peak = rss_mb("RssAnon")
+        self.stop = threading.Event()
+        self.start()
+
+    def run(self):
+        while not self.stop.wait(0.005):
+            self.peak = max(self.peak, rss_mb("RssAnon"))
+
+
+def extract_bytes(path: str) -> int:
+    import PyPDF2
+    with open(path, "rb") as f:
+        data = f.read()  # resp.content
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text() + "\n"
+    return len(text)
+
+
+def extract_mmap(path: str) -> int:
+    import main as app
+    from pdf_buffer import PdfBuffer
+
+    # Spooled like DocumentProcessor.fetch_pdf does with a download
+    with open(path, "rb") as f, PdfBuffer.from_chunks(iter(lambda: f.read(1 << 20), b""),
+                                                      directory=app.PDF_SPOOL_DIR) as buf:
+        return sum(map(len, app.doc_proc.extract_pages(buf)[0]))
+
+
+def worker(mode: str, path: str, backends: str):
+    # Imports are not part of the measurement: main loads the embedding model
+    import PyPDF2  # noqa: F401
+    if mode == "mmap":
+        os.environ["PDF_EXTRACTORS"] = backends
+        import main  # noqa: F401
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")  # reset VmHWM to the current RSS
+    base, anon = rss_mb("VmRSS"), AnonPeak()
+    chars = extract_bytes(path) if mode == "bytes" else extract_mmap(path)
+    anon.stop.set()
+    anon.peak = max(anon.peak, rss_mb("RssAnon"))
+    print(json.dumps({"peak_mb": rss_mb("VmHWM") - base, "anon_mb": anon.peak - anon.base, "chars": chars}))
+
+
+def measure(mode: str, path: str, backends: str) -> dict:
+    out = subprocess.run([sys.executable, __file__, "--worker", mode, path, "--backends", backends],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Peak RSS per MB of PDF, in-memory vs mmap extraction")
+    ap.add_argument("--corpus", help="directory of PDFs (default: synthetic policies)")
+    ap.add_argument("--pages", default="100,400", help="synthetic PDF page counts")
+    ap.add_argument("--image-kb", type=int, default=200, help="image bytes per synthetic page")
+    ap.add_argument("--backends", default="pdfium,pypdf,pypdf2,pdfminer", help="extraction chain for the mmap path")
+    ap.add_argument("--worker", nargs=2, metavar=("MODE", "PDF"), help=argparse.SUPPRESS)
+    ap.add_argument("--out", help="write results as JSON")
+    args = ap.parse_args()
+    if args.worker:
+        return worker(*args.worker, args.backends)
+
+    tmp = tempfile.TemporaryDirectory()
+    if args.corpus:
+        paths = sorted(glob.glob(os.path.join(args.corpus, "*.pdf")))
+    else:
+        from loadtest import make_pdf, policy_pages
+        paths = []
+        for n in map(int, args.pages.split(",")):
+            paths.append(os.path.join(tmp.name, f"synthetic-{n}p.pdf"))
+            with open(paths[-1], "wb") as f:
+                f.write(make_pdf(policy_pages(n, seed=n), image_kb=args.image_kb))
+
+    results = []
+    print(f"{'pdf':<24}{'MB':>7}{'RSS/MB before':>15}{'after':>7}{'anon/MB before':>16}{'after':>7}")
+    for path in paths:
+        size = os.path.getsize(path) / 2**20
+        before, after = measure("bytes", path, args.backends), measure("mmap", path, args.backends)
+        r = {"pdf": os.path.basename(path), "mb": round(size, 2)}
+        for mode, m in (("before", before), ("after", after)):
+            r[f"{mode}_peak_rss_mb"] = round(m["peak_mb"], 1)
+            r[f"{mode}_rss_per_mb"] = round(m["peak_mb"] / size, 2)
+            r[f"{mode}_anon_per_mb"] = round(m["anon_mb"] / size, 2)
+        results.append(r)
+        print(f"{r['pdf']:<24}{r['mb']:>7}{r['before_rss_per_mb']:>15}{r['after_rss_per_mb']:>7}"
+              f"{r['before_anon_per_mb']:>16}{r['after_anon_per_mb']:>7}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
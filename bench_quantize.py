@@ -0,0 +1,120 @@
+# Vector codecs compared with exact float32 search: memory per chunk, search
+# latency and recall@5. Documents come from a DOC_STORE_DIR (--store), or are
+# synthetic (low-rank topics plus noise, roughly like sentence embeddings).
+# A tenth of each document's chunks is held out and used as its queries,
+# and each document gets its own index, as in the service.
+#
+# Trained per document, a setting may not apply to every document (no PCA
+# below pca_dim chunks, fewer PQ bits or int8 on small ones): the codecs
+# actually applied are reported next to each setting, and flagged when they
+# differ from it. Per-document codebooks count towards bytes per chunk.
+#
+#   python bench_quantize.py --store ./doc_store --settings flat,fp16,int8,pq,pca192-int8 --out codecs.json
+#
+# --template trains PQ/PCA codebooks once on all documents (VECTOR_CODEC_PATH)
+# instead of per document.
+
+import argparse, json, time
+from collections import Counter
+
+import numpy as np
+
+from quantize import FAISS_AVAILABLE, VectorCodec, bytes_per_vector, stored_embeddings
+
+
+def synthetic(docs: int, chunks: int, dim: int, rank: int = 32, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(docs):
+        basis = rng.standard_normal((rank, dim))
+        x = rng.standard_normal((chunks, rank)) @ basis + 0.5 * rng.standard_normal((chunks, dim))
+        out.append((x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32))
+    return out
+
+
+def parse(setting: str, args) -> VectorCodec:
+    pca, _, mode = setting.rpartition("-")
+    return VectorCodec(mode, int(pca[3:]) if pca else 0, args.pq_m, args.pq_bits)
+
+
+def top_k(index, queries: np.ndarray, k: int) -> np.ndarray:
+    return index.search(queries, k)[1]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Memory, latency and recall@k of vector codecs")
+    ap.add_argument("--store", help="DOC_STORE_DIR to read embeddings from (default: synthetic)")
+    ap.add_argument("--settings", default="flat,fp16,int8,pq,pca192-fp16,pca192-int8,pca192-pq",
+                    help="codecs, optionally prefixed with pca<dim>-")
+    ap.add_argument("--docs", type=int, default=50, help="synthetic documents")
+    ap.add_argument("--chunks", type=int, default=400, help="chunks per synthetic document")
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--pq-m", type=int, default=48)
+    ap.add_argument("--pq-bits", type=int, default=8)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--template", action="store_true", help="train codebooks once on all documents")
+    ap.add_argument("--out", help="write results as JSON")
+    args = ap.parse_args()
+    if not FAISS_AVAILABLE:
+        ap.error("the codec benchmark needs faiss")
+    import faiss
+    faiss.omp_set_num_threads(1)
+
+    docs = stored_embeddings(args.store) if args.store else synthetic(args.docs, args.chunks, args.dim)
+    rng = np.random.default_rng(1)
+    split = []
+    for x in docs:
+        held = rng.random(len(x)) < 0.1
+        if held.any() and (~held).sum() > args.k:
+            split.append((np.ascontiguousarray(x[~held], np.float32), np.ascontiguousarray(x[held], np.float32)))
+    if not split:
+        ap.error("no document has enough chunks to hold some out")
+    exact = []
+    for base, queries in split:
+        flat = faiss.IndexFlatL2(base.shape[1])
+        flat.add(base)
+        exact.append(top_k(flat, queries, args.k))
+    print(f"{len(split)} documents, {sum(len(b) for b, _ in split)} chunks, "
+          f"{sum(len(q) for _, q in split)} queries, dim {split[0][0].shape[1]}")
+
+    results = {}
+    for setting in args.settings.split(","):
+        codec = parse(setting, args)
+        if args.template:
+            codec.use_template(codec.train(np.concatenate([b for b, _ in split])))
+        start = time.perf_counter()
+        indexes = [codec.build(base) for base, _ in split]
+        build_s = time.perf_counter() - start
+        latencies, recalls, size = [], [], 0.0
+        for index, (base, queries), truth in zip(indexes, split, exact):
+            size += bytes_per_vector(index) * len(base)
+            for q, t in zip(queries, truth):
+                start = time.perf_counter()
+                found = top_k(index, q[None], args.k)[0]
+                latencies.append(1000 * (time.perf_counter() - start))
+                recalls.append(len(set(found) & set(t)) / args.k)
+        applied = Counter(codec.applied(index) for index in indexes)
+        results[setting] = {
+            "applied": dict(applied),
+            "bytes_per_chunk": round(size / sum(len(b) for b, _ in split), 1),
+            "p50_ms": round(float(np.median(latencies)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            f"recall@{args.k}": round(float(np.mean(recalls)), 3),
+            "build_s": round(build_s, 2),
+        }
+        if codec.template is not None:
+            results[setting]["shared_codebook_bytes"] = len(faiss.serialize_index(codec.template))
+        r = results[setting]
+        print(f"{setting:>14}  {r['bytes_per_chunk']:>8} B/chunk  p50 {r['p50_ms']:>7} ms  "
+              f"recall@{args.k} {r[f'recall@{args.k}']:.3f}  build {r['build_s']} s")
+        if codec.template is None and set(applied) != {setting}:
+            print(f"{'':>14}  ! applied as {', '.join(f'{c} ({n} docs)' for c, n in applied.most_common())}")
+        if codec.mode != "flat" and r["bytes_per_chunk"] > 4 * split[0][0].shape[1]:
+            print(f"{'':>14}  ! larger than flat: per-document codebooks outweigh the codes (try --template)")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Single-stage vs two-stage (cross-encoder reranked, adaptive k) retrieval:
+# retrieval latency per request, chunks and estimated prompt tokens per
+# question, and how often the selected context contains the answering clause.
+#
+#   python bench_rerank.py --pages 50 --questions 10 --repeat 5
+
+import argparse, json, time
+
+import numpy as np
+
+import main as app
+from deadline import Deadline
+from loadtest import CLAUSES, QUESTIONS, make_pdf, policy_pages
+from rerank import select_adaptive
+
+
+def run(doc, questions, answers, repeat):
+    latencies, chunks, tokens, hits = [], [], [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        retrieved = app.qry_proc.retrieve(questions, doc, Deadline())
+        selected = [select_adaptive(c, s, app.TOP_K, app.CONTEXT_TOKEN_BUDGET, app.RERANK_GAP)
+                    for c, s, _ in retrieved]
+        latencies.append(time.perf_counter() - start)
+        for (ctx, n), answer in zip(selected, answers):
+            chunks.append(len(ctx))
+            tokens.append(n)
+            hits.append(any(answer in " ".join(c.split()) for c in ctx))
+    return {"retrieval_ms_p50": round(1000 * float(np.median(latencies)), 1),
+            "chunks_per_question": round(float(np.mean(chunks)), 2),
+            "prompt_tokens_per_question": round(float(np.mean(tokens)), 1),
+            "answer_in_context": round(float(np.mean(hits)), 3)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Reranker latency/prompt-size benchmark")
+    ap.add_argument("--pages", type=int, default=50)
+    ap.add_argument("--questions", type=int, default=10)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--out", help="write results as JSON")
+    args = ap.parse_args()
+
+    doc = app.doc_proc.ingest(make_pdf(policy_pages(args.pages, seed=7)))
+    picks = [j % len(QUESTIONS) for j in range(args.questions)]
+    questions, answers = [QUESTIONS[j] for j in picks], [CLAUSES[j] for j in picks]
+    reranker, results = app.reranker, {}
+    app.reranker = None
+    results["single-stage"] = run(doc, questions, answers, args.repeat)
+    if reranker is not None:
+        app.reranker = reranker
+        results["reranked"] = run(doc, questions, answers, args.repeat)
+    else:
+        print(f"reranker unavailable (RERANK_MODEL={app.RERANK_MODEL!r}); single-stage only")
+    print(f"{len(doc.chunks)} chunks, {len(questions)} questions per request")
+    print(f"{'mode':<14}{'ms/request':>12}{'chunks/q':>10}{'tokens/q':>10}{'hit rate':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<14}{r['retrieval_ms_p50']:>12}{r['chunks_per_question']:>10}"
+              f"{r['prompt_tokens_per_question']:>10}{r['answer_in_context']:>10}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
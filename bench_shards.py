@@ -0,0 +1,99 @@
+# Corpus size vs query latency: one in-process IndexFlatL2 over the whole
+# corpus against scatter-gather search over N shard processes. Documents are
+# random vectors (DIM-dimensional, CHUNKS per document) so large corpora can be
+# generated without a model.
+#
+#   python bench_shards.py --sizes 50000,100000,200000,400000 --shards 1,2,4 --plot latency.png
+#
+# Shards run with one faiss thread each; on a machine with fewer cores than
+# shards they compete for CPU and the sharded curves say so.
+
+import argparse, json, os, time
+
+import numpy as np
+
+from shards import FAISS_AVAILABLE, Shard, ShardedIndex, start_local_shards, stop_local_shards
+
+
+def corpus(size: int, dim: int, chunks: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    for start in range(0, size, chunks):
+        yield f"doc{start // chunks}", rng.standard_normal((min(chunks, size - start), dim)).astype(np.float32)
+
+
+def timed(search, queries, repeat: int) -> dict:
+    search(queries)  # warm up (builds the shard indexes)
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        search(queries)
+        latencies.append(1000 * (time.perf_counter() - start))
+    return {"p50_ms": round(float(np.median(latencies)), 2), "p95_ms": round(float(np.percentile(latencies, 95)), 2)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Query latency vs corpus size, single index vs shards")
+    ap.add_argument("--sizes", default="50000,100000,200000", help="corpus sizes in vectors")
+    ap.add_argument("--shards", default="1,2,4", help="shard counts to compare")
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--chunks", type=int, default=200, help="vectors per document")
+    ap.add_argument("--queries", type=int, default=10, help="queries per search (one request)")
+    ap.add_argument("--k", type=int, default=12)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--timeout", type=float, default=30.0, help="per-shard search timeout")
+    ap.add_argument("--out", help="write results as JSON")
+    ap.add_argument("--plot", help="write a latency plot (needs matplotlib)")
+    args = ap.parse_args()
+    if FAISS_AVAILABLE:
+        import faiss
+        faiss.omp_set_num_threads(1)  # the same per-process budget as one shard
+
+    sizes, counts = list(map(int, args.sizes.split(","))), list(map(int, args.shards.split(",")))
+    queries = np.random.default_rng(1).standard_normal((args.queries, args.dim)).astype(np.float32)
+    results = {"single": {}}
+    for size in sizes:
+        single = Shard()  # the same flat index, in this process
+        for doc_id, vectors in corpus(size, args.dim, args.chunks):
+            single.add(doc_id, doc_id, 0, vectors)
+        results["single"][size] = timed(lambda q: single.search(q, args.k), queries, args.repeat)
+        print(f"single index  {size:>9} vectors  p50 {results['single'][size]['p50_ms']:>8} ms")
+        del single
+    for n in counts:
+        addresses, procs = start_local_shards(n)
+        index = ShardedIndex(addresses, args.timeout, segment_size=args.chunks * 8)
+        results[f"{n} shards"], added = {}, 0
+        try:
+            for size in sizes:
+                for doc_id, vectors in corpus(size, args.dim, args.chunks):
+                    if int(doc_id[3:]) * args.chunks >= added:
+                        index.add(doc_id, vectors)
+                added = size
+                r = timed(lambda q: index.search(q, args.k), queries, args.repeat)
+                r["vectors_per_shard"] = [sum(l.values()) for l in index.loads()]
+                results[f"{n} shards"][size] = r
+                print(f"{n} shard(s)    {size:>9} vectors  p50 {r['p50_ms']:>8} ms  per shard {r['vectors_per_shard']}")
+        finally:
+            stop_local_shards(procs, os.path.dirname(addresses[0]))
+
+    print(f"\n{'vectors':>10}" + "".join(f"{mode:>14}" for mode in results))
+    for size in sizes:
+        print(f"{size:>10}" + "".join(f"{results[mode][size]['p50_ms']:>11} ms" for mode in results))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.plot:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        for mode, rows in results.items():
+            plt.plot(sizes, [rows[s]["p50_ms"] for s in sizes], marker="o", label=mode)
+        plt.xlabel("corpus size (vectors)")
+        plt.ylabel(f"p50 latency per request of {args.queries} queries (ms)")
+        plt.legend()
+        plt.grid(True, alpha=0.3)
+        plt.savefig(args.plot, dpi=120, bbox_inches="tight")
+        print(f"plot written to {args.plot}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# Offline bulk ingestion into the persistent document store, so documents are
+# warm before the first live query.
+#
+#   python bulk_ingest.py ./policies --store ./doc_store --workers 8
+#   python bulk_ingest.py manifest.txt --store ./doc_store
+#
+# Inputs are directories (every *.pdf below them) or manifests (one path or
+# URL per line; JSON lines with a "path", "url" or "documents" key also work).
+# As in serve.py the embedding model is loaded once and the pool is forked
+# from this process. Every finished document is appended to a journal in the
+# store, so an interrupted run picks up where it stopped; a file whose bytes
+# are already stored is skipped without extracting it, and a changed file is
+# re-ingested incrementally against its previous version (deleted afterwards
+# with --replace).
+
+import argparse, gc, json, multiprocessing, os, sys, time
+from typing import Iterator, List, Tuple
+
+from pdf_buffer import PdfBuffer
+
+main = None  # the app module, imported once DOC_STORE_DIR is set
+
+
+def is_url(source: str) -> bool:
+    return source.startswith(("http://", "https://"))
+
+
+def read_manifest(path: str) -> Iterator[str]:
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                line = entry.get("path") or entry.get("url") or entry.get("documents")
+                if not line:
+                    continue
+            yield line if is_url(line) else os.path.join(base, line)
+
+
+def collect(inputs: List[str]) -> List[Tuple[str, str]]:
+    """(source key, location) of every input document, one per key."""
+    sources = []
+    for arg in inputs:
+        if os.path.isdir(arg):
+            for root, _, files in os.walk(arg):
+                sources.extend(os.path.join(root, f) for f in files if f.lower().endswith(".pdf"))
+        else:
+            sources.extend(read_manifest(arg))
+    # Source keys match the server's: absolute paths, and URLs without their query
+    # string. Only the key drops it: a signed URL is still fetched with its signature
+    keyed = {}
+    for s in sources:
+        keyed.setdefault(s.split("?")[0] if is_url(s) else os.path.abspath(s), s)
+    return sorted(keyed.items())
+
+
+def load_journal(path: str) -> dict:
+    done = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by the interruption
+                if entry.get("status") in ("ok", "present"):
+                    done[entry["source"]] = entry
+    return done
+
+
+def fingerprint(source: str):
+    # A file changed since its journal entry is ingested again (incrementally)
+    if is_url(source):
+        return None
+    try:
+        st = os.stat(source)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def init_worker(torch_threads: int):
+    if torch_threads:
+        import torch
+        torch.set_num_threads(torch_threads)
+
+
+def ingest_one(task: Tuple[str, str, str, bool]) -> dict:
+    source, location, previous_id, replace = task
+    start = time.monotonic()
+    result = {"source": source, "pid": os.getpid()}
+    try:
+        result["fingerprint"] = fingerprint(source)
+        buf = main.doc_proc.fetch_pdf(location) if is_url(location) else PdfBuffer.open(location)
+        with buf:
+            result["doc_id"] = buf.sha256
+            if main.doc_store.stored(buf.sha256):
+                result.update(status="present", pages=0, chunks=0)
+                return result
+            previous = main.doc_store.get(previous_id) if previous_id else None
+            doc = main.doc_proc.ingest(buf, source=source, previous=previous)
+            main.doc_store.put(doc)
+            if replace:
+                main.doc_store.retire_previous(doc)
+        result.update(status="ok", pages=doc.pages, chunks=len(doc.chunks),
+                      pages_reused=doc.stats.get("pages_reused", 0))
+    except Exception as e:
+        result.update(status="error", error=getattr(e, "detail", None) or str(e) or type(e).__name__)
+    finally:
+        result["seconds"] = round(time.monotonic() - start, 3)
+    return result
+
+
+def rates(totals: dict, elapsed: float) -> str:
+    elapsed = max(elapsed, 1e-9)
+    return (f"{totals['ok'] / elapsed:.2f} docs/s, {totals['pages'] / elapsed:.1f} pages/s, "
+            f"{totals['chunks'] / elapsed:.1f} chunks/s")
+
+
+def run(args) -> int:
+    global main
+    # The store must be configured before the app module reads its environment
+    os.environ["DOC_STORE_DIR"] = args.store
+    os.environ["DOC_CACHE_SIZE"] = "0"  # workers only write; holding documents would just grow them
+    os.environ["SHM_CACHE_BYTES"] = "0"
+    os.environ["SHARDS"] = "0"  # local shards would only live as long as this run
+    import main as app
+    main = app
+
+    journal_path = args.journal or os.path.join(args.store, ".bulk-ingest.jsonl")
+    done = load_journal(journal_path)
+    sources = collect(args.inputs)
+    todo = [(s, loc) for s, loc in sources if s not in done or done[s].get("fingerprint") != fingerprint(s)]
+    previous = {m.get("source"): m["doc_id"] for m in main.doc_store.list() if m.get("source")}
+    print(f"{len(sources)} documents, {len(sources) - len(todo)} already ingested, "
+          f"{len(todo)} to go with {args.workers} workers")
+    if not todo:
+        return 0
+
+    gc.collect()
+    gc.freeze()  # keep the model's pages shared with the forked workers
+    totals = dict.fromkeys(("ok", "present", "error", "pages", "chunks"), 0)
+    pool = multiprocessing.get_context("fork").Pool(
+        args.workers, init_worker, (args.torch_threads,), maxtasksperchild=args.max_tasks or None)
+    start = last_report = time.monotonic()
+    try:
+        with open(journal_path, "a") as journal:
+            tasks = [(s, loc, previous.get(s), args.replace) for s, loc in todo]
+            for n, result in enumerate(pool.imap_unordered(ingest_one, tasks), 1):
+                journal.write(json.dumps(result) + "\n")
+                journal.flush()
+                totals[result["status"]] += 1
+                totals["pages"] += result.get("pages", 0)
+                totals["chunks"] += result.get("chunks", 0)
+                if result["status"] == "error":
+                    print(f"FAILED {result['source']}: {result['error']}", file=sys.stderr)
+                now = time.monotonic()
+                if now - last_report >= args.report_every or n == len(tasks):
+                    last_report = now
+                    print(f"[{n}/{len(tasks)}] {rates(totals, now - start)}")
+        pool.close()
+    except KeyboardInterrupt:
+        pool.terminate()
+        print(f"Interrupted; rerun the same command to resume ({journal_path})", file=sys.stderr)
+        return 130
+    finally:
+        pool.join()
+
+    elapsed = time.monotonic() - start
+    summary = {"documents": len(tasks), "ingested": totals["ok"], "already_stored": totals["present"],
+               "failed": totals["error"], "pages": totals["pages"], "chunks": totals["chunks"],
+               "seconds": round(elapsed, 2), "docs_per_s": round(totals["ok"] / elapsed, 3),
+               "pages_per_s": round(totals["pages"] / elapsed, 2),
+               "chunks_per_s": round(totals["chunks"] / elapsed, 2)}
+    print(f"{totals['ok']} ingested, {totals['present']} already stored, {totals['error']} failed "
+          f"in {elapsed:.1f}s: {rates(totals, elapsed)}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if totals["error"] else 0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Ingest PDFs into the persistent document store")
+    ap.add_argument("inputs", nargs="+", help="directories of PDFs and/or manifest files")
+    ap.add_argument("--store", default=os.getenv("DOC_STORE_DIR"), help="document store directory (DOC_STORE_DIR)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--torch-threads", type=int, default=1, help="per-worker torch intra-op threads")
+    ap.add_argument("--max-tasks", type=int, default=0, help="recycle a worker after this many documents")
+    ap.add_argument("--journal", help="progress journal (default: <store>/.bulk-ingest.jsonl)")
+    ap.add_argument("--replace", action="store_true", help="delete the previous version of a changed document")
+    ap.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    ap.add_argument("--out", help="write the summary as JSON")
+    args = ap.parse_args()
+    if not args.store:
+        ap.error("--store (or DOC_STORE_DIR) is required")
+    sys.exit(run(args))
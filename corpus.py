@@ -0,0 +1,182 @@
+# Corpus-wide search with a two-level index: every document is summarised by
+# a few centroids of its chunk embeddings, a query first finds the closest
+# documents by centroid and then only those documents' chunks are searched.
+
+import logging, threading, time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import metrics
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def centroids(embeddings: np.ndarray, n: int = 4, iterations: int = 8, seed: int = 0) -> np.ndarray:
+    """Up to ``n`` unit-length k-means (cosine) centroids of a document's chunk embeddings."""
+    x = normalize(embeddings)
+    n = min(n, len(x))
+    if n <= 1:
+        return normalize(x.mean(0, keepdims=True))
+    # Spread the seeds along the document: chunks are in reading order, so topics are too
+    centers = x[np.linspace(0, len(x) - 1, n).astype(int)]
+    for _ in range(iterations):
+        assign = (x @ centers.T).argmax(1)
+        for c in range(n):
+            members = x[assign == c]
+            if len(members):
+                centers[c] = members.mean(0)
+        centers = normalize(centers)
+    return centers
+
+
+class CorpusIndex:
+    """Document-level index of chunk-embedding centroids.
+
+    ``search`` returns the documents whose best centroid is closest to each
+    query. With FAISS it is an HNSW graph, so the cost grows with the log of
+    the number of documents. Removed documents are filtered out until they
+    make up a quarter of the graph, which is then rebuilt.
+    """
+
+    def __init__(self, per_doc: int = 4, hnsw_m: int = 32):
+        self.per_doc = per_doc
+        self.hnsw_m = hnsw_m
+        self._lock = threading.Lock()
+        self._docs: Dict[str, Tuple[Optional[str], np.ndarray]] = {}  # doc_id -> (source, centroids)
+        self._row_doc: List[Optional[str]] = []  # index row -> doc_id (None once removed)
+        self._index = None
+        self._matrix = np.zeros((0, 0), np.float32)  # fallback without FAISS
+        self._dead = 0
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._docs
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, doc_id: str, embeddings: np.ndarray, source: Optional[str] = None):
+        if len(embeddings) == 0:
+            return
+        cents = centroids(embeddings, self.per_doc)
+        with self._lock:
+            if doc_id in self._docs:
+                return
+            self._docs[doc_id] = (source, cents)
+            self._append(doc_id, cents)
+
+    def _append(self, doc_id: str, cents: np.ndarray):
+        if FAISS_AVAILABLE:
+            if self._index is None:
+                self._index = faiss.IndexHNSWFlat(cents.shape[1], self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            self._index.add(cents)
+        else:
+            self._matrix = cents.copy() if not len(self._matrix) else np.vstack([self._matrix, cents])
+        self._row_doc.extend([doc_id] * len(cents))
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            entry = self._docs.pop(doc_id, None)
+            if entry is None:
+                return
+            for i, d in enumerate(self._row_doc):
+                if d == doc_id:
+                    self._row_doc[i] = None
+                    self._dead += 1
+            if self._dead * 4 > len(self._row_doc):
+                self._rebuild()
+
+    def _rebuild(self):
+        self._index, self._matrix, self._row_doc, self._dead = None, np.zeros((0, 0), np.float32), [], 0
+        for doc_id, (_, cents) in self._docs.items():
+            self._append(doc_id, cents)
+
+    def search(self, query: np.ndarray, n_docs: int) -> List[Tuple[str, float]]:
+        """The ``n_docs`` documents closest to ``query`` as (doc_id, cosine of its best centroid)."""
+        q = normalize(query).reshape(1, -1)
+        with self._lock:
+            if not self._docs:
+                return []
+            # Several rows per document and rows of removed ones: fetch enough to fill n_docs
+            fetch = min(len(self._row_doc), (n_docs + self._dead) * self.per_doc)
+            if FAISS_AVAILABLE:
+                self._index.hnsw.efSearch = max(64, fetch)
+                scores, rows = self._index.search(q, fetch)
+                scores, rows = scores[0], rows[0]
+            else:
+                sims = (self._matrix @ q[0])
+                rows = np.argsort(-sims)[:fetch]
+                scores = sims[rows]
+            best: Dict[str, float] = {}
+            for score, row in zip(scores, rows):
+                doc_id = self._row_doc[row] if row >= 0 else None
+                if doc_id is not None and doc_id not in best:
+                    best[doc_id] = float(score)
+        return sorted(best.items(), key=lambda ds: -ds[1])[:n_docs]
+
+    def source(self, doc_id: str) -> Optional[str]:
+        entry = self._docs.get(doc_id)
+        return entry[0] if entry else None
+
+    def sync(self, metas: Sequence[dict], vectors: Callable[[str], Optional[np.ndarray]]) -> Tuple[int, int]:
+        """Bring the index in line with a document listing; returns (added, removed)."""
+        listed = {m["doc_id"]: m.get("source") for m in metas}
+        gone = [d for d in list(self._docs) if d not in listed]
+        for doc_id in gone:
+            self.remove(doc_id)
+        added = 0
+        for doc_id, source in listed.items():
+            if doc_id in self._docs:
+                continue
+            embs = vectors(doc_id)
+            if embs is not None:
+                self.add(doc_id, embs, source)
+                added += 1
+        metrics.gauge("corpus_documents").set(len(self._docs))
+        return added, len(gone)
+
+
+class CorpusRefresher:
+    """Keeps a CorpusIndex in sync with ``list_docs()`` on a background thread
+    (documents ingested by other workers or before a restart show up here)."""
+
+    def __init__(self, index: CorpusIndex, list_docs: Callable[[], Sequence[dict]],
+                 vectors: Callable[[str], Optional[np.ndarray]], every: float = 60.0):
+        self.index = index
+        self.list_docs = list_docs
+        self.vectors = vectors
+        self.every = every
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="corpus-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            start = time.monotonic()
+            try:
+                added, removed = self.index.sync(self.list_docs(), self.vectors)
+                if added or removed:
+                    logger.info(f"Corpus index: +{added} -{removed} documents in {time.monotonic() - start:.1f}s")
+            except Exception as e:
+                logger.warning(f"Corpus index refresh failed: {e}")
+            if not self.every or self._stop.wait(self.every):
+                return
@@ -0,0 +1,58 @@
+# Per-request time budget that every pipeline stage consults to degrade
+# gracefully instead of running past the caller's timeout.
+
+import math, time
+from typing import List, Optional
+
+import metrics
+
+PARTIAL_MARKER = "[PARTIAL]"
+
+
+class Deadline:
+    def __init__(self, budget_s: Optional[float] = None):
+        self.budget = budget_s if budget_s and budget_s > 0 else math.inf
+        self.start = time.monotonic()
+        self.at = self.start + self.budget
+        self.degraded: List[str] = []
+
+    @classmethod
+    def from_request(cls, header_s: Optional[float], default_s: Optional[float], margin_s: float = 0.0):
+        """Tighter of the caller-supplied and configured budgets, minus a response margin."""
+        budgets = [b for b in (header_s, default_s) if b and b > 0]
+        return cls(max(0.01, min(budgets) - margin_s) if budgets else None)
+
+    @property
+    def bounded(self) -> bool:
+        return self.budget != math.inf
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    def elapsed_fraction(self) -> float:
+        return 0.0 if not self.bounded else (time.monotonic() - self.start) / self.budget
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def monotonic_deadline(self) -> Optional[float]:
+        return self.at if self.bounded else None
+
+    def timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        """Timeout for a blocking call: the remaining budget, optionally capped."""
+        if not self.bounded:
+            return cap
+        return min(self.remaining(), cap) if cap is not None else self.remaining()
+
+    def allow_optional(self, stage: str, share: float = 0.5) -> bool:
+        """Optional stages run only while less than ``share`` of the budget is spent."""
+        if self.elapsed_fraction() < share:
+            return True
+        self.note(f"skip:{stage}")
+        return False
+
+    def note(self, step: str):
+        """Record a degradation step once per request (surfaced in X-Degraded)."""
+        if step not in self.degraded:
+            self.degraded.append(step)
+            metrics.counter("request_degradations_total", {"step": step}).inc()
@@ -0,0 +1,106 @@
+# Near-duplicate chunk detection with MinHash signatures and LSH banding.
+# Policy documents restate the same clause for every plan variant; only one
+# representative of each group is embedded and indexed, the others are kept
+# as references (aliases) to it. Repeated questions within a request are
+# clustered the same way (by query embedding) and answered once.
+
+import re, zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+_PRIME = (1 << 61) - 1
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 64, shingle: int = 3, bands: int = 16, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 31, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self.b = rng.randint(0, 1 << 31, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self.shingle = shingle
+        self.bands = bands
+        self.rows = num_perm // bands
+
+    def shingles(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower())
+        grams = {" ".join(words[i:i + self.shingle]) for i in range(max(1, len(words) - self.shingle + 1))}
+        return np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str) -> np.ndarray:
+        x = self.shingles(text)
+        # (a*x + b) mod p over 32-bit inputs and 31-bit coefficients stays below 2**63
+        return ((np.outer(x, self.a) + self.b) % _PRIME).min(axis=0)
+
+    def band_keys(self, sig: np.ndarray) -> List[bytes]:
+        return [sig[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+
+def collapse_near_duplicates(chunks: List[str], threshold: float = 0.9,
+                             hasher: MinHasher = None) -> Tuple[List[str], Dict[int, List[int]]]:
+    """Representatives in first-seen order and their aliases.
+
+    The mapping is ``{position in the returned list: [positions in chunks]}``;
+    the representative of a group is its first member. Chunks whose numbers
+    differ (limits, waiting periods, percentages) are never merged, however
+    similar the surrounding wording.
+    """
+    hasher = hasher or MinHasher()
+    buckets: Dict[bytes, List[int]] = {}
+    sigs, numbers, reps, aliases = {}, {}, {}, {}
+    for i, chunk in enumerate(chunks):
+        sig = hasher.signature(chunk)
+        nums = tuple(_NUMBER.findall(chunk))
+        keys = hasher.band_keys(sig)
+        match = None
+        for cand in sorted({r for k in keys for r in buckets.get(k, ())}):
+            if numbers[cand] == nums and np.mean(sigs[cand] == sig) >= threshold:
+                match = cand
+                break
+        if match is not None:
+            aliases.setdefault(match, []).append(i)
+            continue
+        sigs[i], numbers[i] = sig, nums
+        reps[i] = len(reps)
+        for k in keys:
+            buckets.setdefault(k, []).append(i)
+    return [chunks[i] for i in reps], {reps[r]: a for r, a in aliases.items()}
+
+
+_QUESTION_SPACE = re.compile(r"\s+")
+# Tokens that tell otherwise identical questions apart: "Plan A" / "Plan B", "30 days" / "60 days"
+_DISTINGUISHING = re.compile(r"\b(?:\d+(?:[.,]\d+)?|[A-Z]{1,3})\b")
+
+
+def normalize_question(question: str) -> str:
+    return _QUESTION_SPACE.sub(" ", question).strip().rstrip("?.! ").lower()
+
+
+def cluster_questions(questions: List[str], embeddings: np.ndarray,
+                      threshold: float = 0.95) -> Tuple[List[int], List[int]]:
+    """Indices of one representative per cluster, and each question's cluster.
+
+    Questions equal after normalization always share a cluster; otherwise a
+    question joins the first representative whose embedding has cosine
+    similarity >= ``threshold`` and which mentions the same numbers and
+    short upper-case tokens.
+    """
+    embs = np.asarray(embeddings, dtype=np.float32)
+    embs = embs / np.maximum(np.linalg.norm(embs, axis=1, keepdims=True), 1e-12)
+    reps, assign, seen = [], [], {}
+    for i, q in enumerate(questions):
+        key = normalize_question(q)
+        marks = sorted(_DISTINGUISHING.findall(q))
+        cluster = seen.get(key)
+        if cluster is None:
+            for c, r in enumerate(reps):
+                if embs[i] @ embs[r] >= threshold and sorted(_DISTINGUISHING.findall(questions[r])) == marks:
+                    cluster = c
+                    break
+        if cluster is None:
+            cluster = len(reps)
+            reps.append(i)
+        seen.setdefault(key, cluster)
+        assign.append(cluster)
+    return reps, assign
@@ -0,0 +1,275 @@
+# Document store: ingested documents keyed by content hash, held in an LRU
+# in memory and optionally persisted to disk so handles survive restarts.
+
+import json, logging, os, shutil, threading, time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class IngestedDocument:
+    def __init__(self, doc_id: str, chunks: List[str], embeddings: np.ndarray, index,
+                 pages: int, truncated: bool = False, source: Optional[str] = None,
+                 page_hashes: Optional[List[str]] = None, page_texts: Optional[List[str]] = None,
+                 stats: Optional[dict] = None, aliases: Optional[Dict[int, List[int]]] = None):
+        self.doc_id = doc_id  # sha256 of the PDF bytes
+        self.chunks = chunks
+        self.embeddings = embeddings
+        self.index = index
+        self.pages = pages
+        self.truncated = truncated  # page extraction was cut short by a deadline
+        self.source = source
+        # Per-page content hashes and texts, so a new version only re-extracts changed pages
+        self.page_hashes = page_hashes or []
+        self.page_texts = page_texts or []
+        self.stats = stats or {}
+        # chunk index -> positions (in the chunk sequence before dedup) of the near-duplicates it stands for
+        self.aliases = aliases or {}
+        self.shared = False  # arrays are views of a cross-process segment (shm_cache)
+        self.created_at = time.time()
+
+    def meta(self) -> dict:
+        return {"doc_id": self.doc_id, "pages": self.pages, "chunks": len(self.chunks),
+                "source": self.source, "created_at": self.created_at}
+
+
+class DocumentStore:
+    """LRU of up to ``max_docs`` documents; with ``directory`` every document
+    is also written to ``<directory>/<doc_id>/`` and reloaded on a miss
+    (the index is rebuilt from the stored embeddings with ``build_index``).
+
+    A new version of a ``source`` is diffed against the latest stored one
+    (``latest_for``), which stays until ``retire_previous`` is asked to
+    delete it: sources drop the query string, so two different files can
+    share one.
+
+    With ``shared`` (a shm_cache.SharedDocumentCache) documents are published
+    to a segment all worker processes map, and the LRU holds views of it.
+    With ``sharded`` (a shards.ShardedIndex) stored vectors are also placed
+    on the shards and removed from them with the document.
+
+    Documents are content-addressed, so several tenants can own one: owners
+    are recorded with ``claim`` (as empty files under ``<doc_id>/owners/``
+    when persisted, so every worker sees them).
+    """
+
+    def __init__(self, build_index: Callable[[np.ndarray], object], max_docs: int = 16,
+                 directory: Optional[str] = None, shared=None, sharded=None):
+        self.build_index = build_index
+        self.max_docs = max_docs
+        self.directory = directory
+        self.shared = shared
+        self.sharded = sharded
+        self._docs: "OrderedDict[str, IngestedDocument]" = OrderedDict()
+        self._by_source: Dict[str, str] = {}
+        self._owners: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        # Called with the doc_id of every deleted or superseded document
+        self.on_delete: List[Callable[[str], None]] = []
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, doc_id: str) -> str:
+        return os.path.join(self.directory, doc_id)
+
+    def _remember(self, doc: IngestedDocument):
+        with self._lock:
+            self._docs[doc.doc_id] = doc
+            self._docs.move_to_end(doc.doc_id)
+            while len(self._docs) > self.max_docs:
+                self._docs.popitem(last=False)
+
+    def get(self, doc_id: str) -> Optional[IngestedDocument]:
+        if not doc_id.isalnum():
+            return None
+        with self._lock:
+            doc = self._docs.get(doc_id)
+            if doc is not None and doc.shared and not self.shared.touch(doc_id):
+                del self._docs[doc_id]  # evicted by the coordinator: release our mapping
+                doc = None
+            if doc is not None:
+                self._docs.move_to_end(doc_id)
+                return doc
+        doc = self.shared.attach(doc_id) if self.shared else None
+        if doc is None and self.directory:
+            doc = self._load(doc_id)
+            if doc is not None and self.shared:
+                doc = self.shared.publish(doc)
+        if doc is not None:
+            self._remember(doc)
+        return doc
+
+    def peek(self, doc_id: str) -> Optional[IngestedDocument]:
+        """Like ``get``, but a document that is not held is read without
+        building its index or taking a place in the LRU (``index`` is None)."""
+        if not doc_id.isalnum():
+            return None
+        with self._lock:
+            doc = self._docs.get(doc_id)
+        if doc is None and self.shared:
+            doc = self.shared.attach(doc_id)
+        if doc is None and self.directory:
+            doc = self._load(doc_id, build_index=False)
+        return doc
+
+    def vectors(self, doc_id: str) -> Optional[np.ndarray]:
+        """A stored document's chunk embeddings (memory-mapped when read from disk)."""
+        with self._lock:
+            doc = self._docs.get(doc_id)
+        if doc is not None:
+            return doc.embeddings
+        if self.directory and doc_id.isalnum():
+            try:
+                return np.load(os.path.join(self._path(doc_id), "embeddings.npy"), mmap_mode="r")
+            except (OSError, ValueError):
+                return None
+        return None
+
+    def stored(self, doc_id: str) -> bool:
+        """Whether ``doc_id`` is held, without loading it."""
+        with self._lock:
+            if doc_id in self._docs:
+                return True
+        return bool(self.directory) and doc_id.isalnum() and os.path.isdir(self._path(doc_id))
+
+    def latest_for(self, source: Optional[str]) -> Optional[IngestedDocument]:
+        """Most recent stored version of ``source`` (a URL without its query string)."""
+        if not source:
+            return None
+        doc_id = self._by_source.get(source)
+        if doc_id is None and self.directory:
+            versions = [m for m in self.list() if m.get("source") == source]
+            doc_id = versions[-1]["doc_id"] if versions else None
+        return self.get(doc_id) if doc_id else None
+
+    def put(self, doc: IngestedDocument):
+        if doc.truncated:
+            return  # never serve a deadline-truncated copy to later requests
+        if self.directory and not os.path.isdir(self._path(doc.doc_id)):
+            self._save(doc)
+        self._remember(self.shared.publish(doc) if self.shared else doc)
+        if self.sharded:
+            try:
+                self.sharded.add(doc.doc_id, doc.embeddings)
+            except Exception as e:
+                logger.warning(f"Could not place {doc.doc_id} on the shards: {e}")  # searches fall back
+        if doc.source:
+            with self._lock:
+                self._by_source[doc.source] = doc.doc_id
+
+    def claim(self, doc_id: str, tenant: str):
+        with self._lock:
+            self._owners.setdefault(doc_id, set()).add(tenant)
+        if self.directory and os.path.isdir(self._path(doc_id)) and tenant.isalnum():
+            try:
+                os.makedirs(os.path.join(self._path(doc_id), "owners"), exist_ok=True)
+                open(os.path.join(self._path(doc_id), "owners", tenant), "a").close()
+            except OSError as e:
+                logger.warning(f"Could not record the owner of {doc_id}: {e}")
+
+    def owners(self, doc_id: str) -> Set[str]:
+        if not doc_id.isalnum():
+            return set()
+        with self._lock:
+            owners = set(self._owners.get(doc_id, ()))
+        if self.directory:
+            try:
+                owners.update(os.listdir(os.path.join(self._path(doc_id), "owners")))
+            except OSError:
+                pass
+        return owners
+
+    def disown(self, doc_id: str, tenant: str) -> Set[str]:
+        """Drop ``tenant`` from the owners of ``doc_id``; returns the owners left."""
+        with self._lock:
+            self._owners.get(doc_id, set()).discard(tenant)
+        if self.directory and doc_id.isalnum() and tenant.isalnum():
+            try:
+                os.remove(os.path.join(self._path(doc_id), "owners", tenant))
+            except OSError:
+                pass
+        return self.owners(doc_id)
+
+    def retire_previous(self, doc: IngestedDocument) -> Optional[str]:
+        """Delete the version ``doc`` was diffed against; returns its doc_id, if any."""
+        previous = doc.stats.get("previous_doc_id")
+        if previous and previous != doc.doc_id and self.delete(previous):
+            return previous
+        return None
+
+    def delete(self, doc_id: str) -> bool:
+        if not doc_id.isalnum():
+            return False
+        with self._lock:
+            found = self._docs.pop(doc_id, None) is not None
+            self._owners.pop(doc_id, None)
+        if self.shared and self.shared.remove(doc_id):
+            found = True
+        if self.directory and os.path.isdir(self._path(doc_id)):
+            shutil.rmtree(self._path(doc_id), ignore_errors=True)
+            found = True
+        if self.sharded:
+            self.sharded.remove(doc_id)
+        if found:
+            for hook in self.on_delete:
+                try:
+                    hook(doc_id)
+                except Exception as e:
+                    logger.warning(f"Delete hook failed for {doc_id}: {e}")
+        return found
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            metas: Dict[str, dict] = {d: doc.meta() for d, doc in self._docs.items()}
+        if self.shared:
+            for m in self.shared.list():
+                metas.setdefault(m["doc_id"], m)
+        if self.directory:
+            for doc_id in os.listdir(self.directory):
+                if doc_id not in metas and not doc_id.startswith("."):
+                    try:
+                        with open(os.path.join(self.directory, doc_id, "meta.json")) as f:
+                            metas[doc_id] = json.load(f)
+                    except (OSError, ValueError):
+                        continue
+        return sorted(metas.values(), key=lambda m: m["created_at"])
+
+    def _save(self, doc: IngestedDocument):
+        final = self._path(doc.doc_id)
+        tmp = os.path.join(self.directory, f".{doc.doc_id}.{os.getpid()}.tmp")
+        try:
+            os.makedirs(tmp, exist_ok=True)
+            np.save(os.path.join(tmp, "embeddings.npy"), np.asarray(doc.embeddings, dtype=np.float32))
+            with open(os.path.join(tmp, "chunks.json"), "w") as f:
+                json.dump(list(doc.chunks), f)
+            with open(os.path.join(tmp, "pages.json"), "w") as f:
+                json.dump({"hashes": doc.page_hashes, "texts": list(doc.page_texts),
+                           "aliases": doc.aliases}, f)
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                json.dump(doc.meta(), f)
+            os.rename(tmp, final)  # atomic publish; loses the race harmlessly if another writer won
+        except OSError as e:
+            logger.warning(f"Could not persist document {doc.doc_id}: {e}")
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _load(self, doc_id: str, build_index: bool = True) -> Optional[IngestedDocument]:
+        path = self._path(doc_id)
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            with open(os.path.join(path, "chunks.json")) as f:
+                chunks = json.load(f)
+            embs = np.load(os.path.join(path, "embeddings.npy"))
+            with open(os.path.join(path, "pages.json")) as f:
+                pages = json.load(f)
+        except (OSError, ValueError):
+            return None
+        doc = IngestedDocument(doc_id, chunks, embs, self.build_index(embs) if build_index else None, meta["pages"],
+                               source=meta.get("source"), page_hashes=pages["hashes"],
+                               page_texts=pages["texts"],
+                               aliases={int(k): v for k, v in pages.get("aliases", {}).items()})
+        doc.created_at = meta["created_at"]
+        return doc
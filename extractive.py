@@ -0,0 +1,72 @@
+# Extractive fast path: fact lookups whose answer is one sentence of the
+# retrieved context are answered with that sentence instead of an LLM call.
+
+import re, time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import metrics
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_CLAUSE_NUMBER = re.compile(r"^\(?\d+(?:\.\d+)*\)?\s+")
+_NUMBER_WORDS = ("one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|fifteen|eighteen|"
+                 "twenty|thirty|forty|forty-five|fifty|sixty|ninety|twenty-four|thirty-six|forty-eight")
+DURATION = re.compile(rf"\b(?:\d+|{_NUMBER_WORDS})\s*(?:-\s*)?(?:days?|weeks?|months?|years?)\b", re.I)
+AMOUNT = re.compile(r"\d[\d,]*(?:\.\d+)?\s*(?:%|percent|lakhs?|crores?)|(?:rs\.?|inr|₹)\s*\d|\b(?:"
+                    + _NUMBER_WORDS + r")\s+percent\b", re.I)
+ASKS_DURATION = re.compile(r"\b(?:how long|period|duration|when|how many (?:days|months|years))\b", re.I)
+ASKS_AMOUNT = re.compile(r"\b(?:how much|percent(?:age)?|limit|sub-limits?|amount|capped|cap|discount|"
+                         r"sum insured|co-?payment)\b", re.I)
+
+
+def sentences(chunks: Sequence[str], min_chars: int = 25) -> List[str]:
+    out = []
+    for chunk in chunks:
+        for s in _SENTENCE_END.split(chunk):
+            s = " ".join(s.split())
+            # Chunk windows cut sentences: keep only ones that start and end cleanly
+            if len(s) >= min_chars and s[0].isalnum() and not s[0].islower() and s[-1] in ".!?":
+                out.append(_CLAUSE_NUMBER.sub("", s))
+    return list(dict.fromkeys(out))
+
+
+def pattern_bonus(question: str, sentence: str, weight: float) -> float:
+    bonus = 0.0
+    for asks, pattern in ((ASKS_DURATION, DURATION), (ASKS_AMOUNT, AMOUNT)):
+        if asks.search(question):
+            bonus += weight if pattern.search(sentence) else -weight
+    return bonus
+
+
+class ExtractiveAnswerer:
+    """Scores context sentences by embedding similarity to the question plus a
+    bonus when a duration/amount question meets a sentence containing one."""
+
+    def __init__(self, model, threshold: float = 0.7, bonus: float = 0.1):
+        self.model = model
+        self.threshold = threshold
+        self.bonus = bonus
+
+    def best_sentence(self, question: str, q_emb: np.ndarray, context: Sequence[str]) -> Tuple[Optional[str], float]:
+        cands = sentences(context)
+        if not cands:
+            return None, 0.0
+        embs = self.model.encode(cands, normalize_embeddings=True)
+        q = q_emb / (np.linalg.norm(q_emb) or 1.0)
+        scores = embs @ q + np.array([pattern_bonus(question, s, self.bonus) for s in cands])
+        best = int(np.argmax(scores))
+        return cands[best], float(scores[best])
+
+    def answer(self, question: str, q_emb: np.ndarray, context: Sequence[str],
+               llm_latency: float) -> Optional[str]:
+        """The extracted sentence if confident enough, else None (use the LLM)."""
+        start = time.monotonic()
+        sentence, score = self.best_sentence(question, q_emb, context)
+        if sentence is None or score < self.threshold:
+            metrics.counter("extractive_answers_total", {"outcome": "miss"}).inc()
+            return None
+        metrics.counter("extractive_answers_total", {"outcome": "hit"}).inc()
+        metrics.histogram("extractive_latency_saved_seconds").observe(
+            max(0.0, llm_latency - (time.monotonic() - start)))
+        return sentence
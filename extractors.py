@@ -0,0 +1,249 @@
+# Pluggable PDF text extraction. Backends are tried fastest first, page by
+# page; only pages a backend fails on (exception, None, empty or garbled
+# text) are retried with the next, slower one.
+
+import logging, threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+import PyPDF2
+
+import metrics
+from pdf_buffer import BufferReader, PdfBuffer, as_buffer
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+try:
+    import pypdf
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+try:
+    from pdfminer.high_level import extract_text as pdfminer_extract_text
+    PDFMINER_AVAILABLE = True
+except ImportError:
+    PDFMINER_AVAILABLE = False
+
+
+class PageExtractor(ABC):
+    name = "base"
+
+    @abstractmethod
+    def open(self, data: bytes):
+        ...
+
+    @abstractmethod
+    def page_count(self, doc) -> int:
+        ...
+
+    @abstractmethod
+    def page_text(self, doc, i: int) -> Optional[str]:
+        ...
+
+    def close(self, doc):
+        pass
+
+
+# ``data`` handed to the backends is bytes or a pdf_buffer.PdfBuffer; the
+# Python backends read it through their own BufferReader instead of a BytesIO copy.
+
+
+class _PdfiumHandle:
+    def __init__(self, data):
+        self.data = data
+        self.doc = None
+        self.pages_read = 0
+
+    def reopen(self):
+        if self.doc is not None:
+            self.doc.close()
+        # From a file pdfium reads blocks on demand; from bytes it uses them in place
+        src = self.data.path if isinstance(self.data, PdfBuffer) else self.data
+        self.doc = pdfium.PdfDocument(src if isinstance(src, (str, bytes)) else BufferReader(src), autoclose=True)
+        self.pages_read = 0
+
+
+class PdfiumExtractor(PageExtractor):
+    name = "pdfium"
+    _lock = threading.Lock()  # pdfium is not thread-safe
+
+    def __init__(self, reopen_pages: int = 50):
+        # pdfium keeps every object it parsed (image streams included) until the
+        # document is closed, so long documents are reopened every few pages
+        self.reopen_pages = reopen_pages
+
+    def open(self, data):
+        handle = _PdfiumHandle(data)
+        with self._lock:
+            handle.reopen()
+        return handle
+
+    def page_count(self, handle):
+        return len(handle.doc)
+
+    def page_text(self, handle, i):
+        with self._lock:
+            if handle.pages_read >= self.reopen_pages:
+                handle.reopen()
+            handle.pages_read += 1
+            page = handle.doc[i]
+            textpage = page.get_textpage()
+            try:
+                return textpage.get_text_bounded()
+            finally:
+                textpage.close()
+                page.close()
+
+    def close(self, handle):
+        with self._lock:
+            handle.doc.close()
+
+
+class PyPDFExtractor(PageExtractor):
+    # pypdf and its predecessor PyPDF2 share the reader API
+    def __init__(self, module, name: str):
+        self.module = module
+        self.name = name
+
+    def open(self, data):
+        return self.module.PdfReader(BufferReader(as_buffer(data)))
+
+    def page_count(self, doc):
+        return len(doc.pages)
+
+    def page_text(self, doc, i):
+        try:
+            return doc.pages[i].extract_text()
+        finally:
+            release_objects(doc)
+
+    def close(self, doc):
+        doc.stream.close()
+
+
+class PdfminerExtractor(PageExtractor):
+    name = "pdfminer"
+
+    def open(self, data):
+        return as_buffer(data)
+
+    def page_count(self, doc):
+        with BufferReader(doc) as f:
+            return len(PyPDF2.PdfReader(f).pages)
+
+    def page_text(self, doc, i):
+        with BufferReader(doc) as f:
+            return pdfminer_extract_text(f, page_numbers=[i])
+
+
+def release_objects(reader):
+    # Drop the pypdf/PyPDF2 object cache (decoded content streams, fonts) after
+    # each page so memory does not grow with the page count; objects that are
+    # needed again are re-read from the buffer.
+    reader.resolved_objects.clear()
+
+
+def available_backends() -> Dict[str, PageExtractor]:
+    backends = {}
+    if PDFIUM_AVAILABLE:
+        backends["pdfium"] = PdfiumExtractor()
+    if PYPDF_AVAILABLE:
+        backends["pypdf"] = PyPDFExtractor(pypdf, "pypdf")
+    backends["pypdf2"] = PyPDFExtractor(PyPDF2, "pypdf2")
+    if PDFMINER_AVAILABLE:
+        backends["pdfminer"] = PdfminerExtractor()
+    return backends
+
+
+def is_usable(text: Optional[str]) -> bool:
+    if not text or not text.strip():
+        return False
+    bad = sum(1 for c in text if c == "\ufffd" or (c < " " and c not in "\n\r\t\f"))
+    return bad / len(text) < 0.1
+
+
+class ChainedDocument:
+    """One PDF opened against a chain of backends; fallbacks are opened on first need."""
+
+    def __init__(self, backends: List[PageExtractor], data: bytes):
+        self.backends = backends
+        self.data = data
+        self._docs: Dict[str, object] = {}
+        self._broken: Dict[str, Exception] = {}
+        self.fallbacks = 0
+
+    def _doc(self, backend: PageExtractor):
+        if backend.name in self._broken:
+            raise self._broken[backend.name]
+        if backend.name not in self._docs:
+            try:
+                self._docs[backend.name] = backend.open(self.data)
+            except Exception as e:
+                self._broken[backend.name] = e  # don't retry the open for every page
+                raise
+        return self._docs[backend.name]
+
+    def page_count(self) -> int:
+        for backend in self.backends:
+            try:
+                return backend.page_count(self._doc(backend))
+            except Exception as e:
+                logger.warning(f"{backend.name} could not open the PDF: {e}")
+        raise ValueError("no extraction backend could open the PDF")
+
+    def page_text(self, i: int) -> str:
+        best = ""
+        for n, backend in enumerate(self.backends):
+            try:
+                text = backend.page_text(self._doc(backend), i)
+            except Exception as e:
+                logger.debug(f"{backend.name} failed on page {i}: {e}")
+                text = None
+            if is_usable(text):
+                if n:
+                    self.fallbacks += 1
+                metrics.counter("extract_pages_total", {"backend": backend.name}).inc()
+                return text
+            best = best or (text or "")
+        metrics.counter("extract_pages_total", {"backend": "none"}).inc()
+        return best  # scanned or empty page: nothing usable anywhere
+
+    def close(self):
+        for backend in self.backends:
+            if backend.name in self._docs:
+                try:
+                    backend.close(self._docs[backend.name])
+                except Exception:
+                    pass
+        self._docs.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ExtractionChain:
+    def __init__(self, order: List[str]):
+        backends = available_backends()
+        self.backends = [backends[name] for name in order if name in backends]
+        if not self.backends:
+            self.backends = [backends["pypdf2"]]
+        missing = [name for name in order if name not in backends]
+        if missing:
+            logger.info(f"PDF backends not installed, skipped: {', '.join(missing)}")
+
+    @property
+    def names(self) -> List[str]:
+        return [b.name for b in self.backends]
+
+    def open(self, data: bytes) -> ChainedDocument:
+        return ChainedDocument(self.backends, data)
@@ -0,0 +1,242 @@
+# Asynchronous jobs: a SQLite-backed queue drained by background worker
+# threads, so long documents are processed independently of any HTTP connection.
+
+import json, logging, os, socket, sqlite3, threading, time, uuid
+from typing import Callable, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    tenant TEXT NOT NULL,
+    status TEXT NOT NULL,          -- queued | running | done | failed
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    request TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,                    -- host:pid:token of the process running it
+    created_at REAL NOT NULL,
+    started_at REAL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._owner = (None, None)
+        with self._conn() as db:
+            db.executescript(SCHEMA)
+            if "owner" not in [c["name"] for c in db.execute("PRAGMA table_info(jobs)")]:
+                db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+
+    @property
+    def owner(self) -> str:
+        """This process, as recorded on the jobs it runs; the token tells a
+        restarted process apart from an earlier one that had the same pid."""
+        pid, owner = self._owner
+        if pid != os.getpid():
+            owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            self._owner = (os.getpid(), owner)
+        return owner
+
+    def _dead(self, owner: Optional[str]) -> bool:
+        host, _, rest = (owner or "").partition(":")
+        pid, _, token = rest.partition(":")
+        if host != socket.gethostname() or not pid.isdigit():
+            return False  # another host's process: only its lease tells
+        return not _alive(int(pid)) or (int(pid) == os.getpid() and owner != self.owner)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # A connection inherited through fork (serve.py workers) must not be reused
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def submit(self, tenant: str, request: dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (id, tenant, status, stage, request, created_at, updated_at) "
+            "VALUES (?, ?, 'queued', 'queued', ?, ?, ?)",
+            (job_id, tenant, json.dumps(request), now, now))
+        metrics.counter("jobs_submitted_total").inc()
+        return job_id
+
+    def claim(self) -> Optional[sqlite3.Row]:
+        """Atomically move the oldest queued job to running and return it."""
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT * FROM jobs WHERE status = 'queued' "
+                             "ORDER BY created_at LIMIT 1").fetchone()
+            if row is not None:
+                now = time.time()
+                db.execute("UPDATE jobs SET status = 'running', stage = 'starting', attempts = attempts + 1, "
+                           "owner = ?, started_at = ?, updated_at = ? WHERE id = ?",
+                           (self.owner, now, now, row["id"]))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return row
+
+    def progress(self, job_id: str, stage: str, fraction: float):
+        self._conn().execute("UPDATE jobs SET stage = ?, progress = ?, updated_at = ? WHERE id = ? AND owner = ?",
+                             (stage, round(fraction, 4), time.time(), job_id, self.owner))
+
+    def heartbeat(self):
+        """Renew the lease on every job this process is running."""
+        self._conn().execute("UPDATE jobs SET updated_at = ? WHERE status = 'running' AND owner = ?",
+                             (time.time(), self.owner))
+
+    def finish(self, job_id: str, result: Optional[dict] = None, error: Optional[str] = None):
+        now = time.time()
+        status = "failed" if error is not None else "done"
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, stage = ?, progress = COALESCE(?, progress), result = ?, error = ?, "
+            "updated_at = ?, finished_at = ? WHERE id = ? AND owner = ?",
+            (status, status, 1.0 if error is None else None, json.dumps(result) if result is not None else None,
+             error, now, now, job_id, self.owner))
+        metrics.counter("jobs_finished_total", {"status": status}).inc()
+
+    def get(self, job_id: str) -> Optional[sqlite3.Row]:
+        return self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def recover(self, max_attempts: int, lease_s: float) -> int:
+        """Requeue running jobs whose process died, or (on another host) whose
+        lease was not renewed for ``lease_s`` seconds; returns how many.
+
+        Jobs that already took ``max_attempts`` workers down are failed instead.
+        """
+        now = time.time()
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            lost = [r["id"] for r in db.execute("SELECT id, owner, updated_at FROM jobs WHERE status = 'running'")
+                    if r["updated_at"] < now - lease_s or self._dead(r["owner"])]
+            marks = ",".join("?" * len(lost))
+            db.execute("UPDATE jobs SET status = 'failed', stage = 'failed', error = 'worker died repeatedly', "
+                       f"owner = NULL, updated_at = ?, finished_at = ? WHERE id IN ({marks}) AND attempts >= ?",
+                       (now, now, *lost, max_attempts))
+            requeued = db.execute("UPDATE jobs SET status = 'queued', stage = 'queued', progress = 0, owner = NULL, "
+                                  f"updated_at = ? WHERE id IN ({marks}) AND status = 'running'",
+                                  (now, *lost)).rowcount
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return requeued
+
+    def purge(self, retention_s: float) -> int:
+        cur = self._conn().execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                                   (time.time() - retention_s,))
+        return cur.rowcount
+
+    def depth(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+
+class JobWorkers:
+    """``workers`` threads that claim jobs and run ``handler(request, tenant, progress)``.
+
+    ``progress(stage, fraction)`` is persisted so status polls see it. Running
+    jobs hold a lease that a heartbeat renews every ``lease_s / 3`` seconds;
+    every worker process requeues jobs whose owner died or whose lease lapsed.
+    """
+
+    def __init__(self, store: JobStore, handler: Callable[[dict, str, Callable[[str, float], None]], dict],
+                 workers: int = 2, retention_s: float = 86400.0, max_attempts: int = 3, lease_s: float = 300.0):
+        self.store = store
+        self.handler = handler
+        self.workers = workers
+        self.retention_s = retention_s
+        self.max_attempts = max_attempts
+        self.lease_s = lease_s
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._last_purge = 0.0
+
+    def start(self):
+        self._recover()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        t = threading.Thread(target=self._keep_leases, name="job-heartbeat", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def _recover(self):
+        recovered = self.store.recover(self.max_attempts, self.lease_s)
+        if recovered:
+            logger.info(f"Requeued {recovered} interrupted job(s)")
+            self._wake.set()
+
+    def _keep_leases(self):
+        while not self._stop.wait(self.lease_s / 3):
+            try:
+                self.store.heartbeat()
+                self._recover()
+            except sqlite3.Error as e:
+                logger.warning(f"Job lease renewal failed: {e}")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def notify(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            if time.time() - self._last_purge > 60:
+                self._last_purge = time.time()
+                self.store.purge(self.retention_s)
+            job = self.store.claim()
+            metrics.gauge("jobs_queue_depth").set(self.store.depth())
+            if job is None:
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+            self._execute(job)
+
+    def _execute(self, job: sqlite3.Row):
+        job_id = job["id"]
+        metrics.histogram("jobs_queue_wait_seconds").observe(time.time() - job["created_at"])
+        start = time.monotonic()
+        try:
+            result = self.handler(json.loads(job["request"]), job["tenant"],
+                                  lambda stage, fraction: self.store.progress(job_id, stage, fraction))
+            self.store.finish(job_id, result=result)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self.store.finish(job_id, error=str(getattr(e, "detail", e)))
+        metrics.histogram("jobs_run_seconds").observe(time.monotonic() - start)
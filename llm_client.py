@@ -0,0 +1,230 @@
+# Resilient wrapper around a blocking LLM call: per-call deadlines, jittered
+# exponential backoff, optional hedged requests, a circuit breaker and a
+# provider quota scheduler.
+
+import logging, random, threading, time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+import metrics
+from rate_limit import RateLimiter, RateLimitTimeout, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+try:
+    from google.api_core import exceptions as gexc
+    RETRYABLE_EXCEPTIONS = (gexc.TooManyRequests, gexc.InternalServerError, gexc.BadGateway,
+                            gexc.ServiceUnavailable, gexc.GatewayTimeout, gexc.DeadlineExceeded)
+except ImportError:
+    RETRYABLE_EXCEPTIONS = ()
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMTimeout(LLMError):
+    pass
+
+
+class CircuitOpenError(LLMError):
+    pass
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (LLMTimeout, TimeoutError, ConnectionError)):
+        return True
+    if RETRYABLE_EXCEPTIONS and isinstance(exc, RETRYABLE_EXCEPTIONS):
+        return True
+    code = getattr(exc, "code", None)
+    return isinstance(code, int) and code in RETRYABLE_STATUS
+
+
+def is_throttle(exc: BaseException) -> bool:
+    if RETRYABLE_EXCEPTIONS and isinstance(exc, gexc.TooManyRequests):
+        return True
+    return getattr(exc, "code", None) == 429
+
+
+class CircuitBreaker:
+    # closed -> open after `failure_threshold` consecutive failures; open ->
+    # half_open after `reset_timeout`, where a single probe decides the next state.
+    STATES = ("closed", "open", "half_open")
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, name: str = "llm"):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self._state_gauge = metrics.gauge("llm_breaker_state", {"breaker": name})
+        self._name = name
+
+    def _set(self, state: str):
+        if state != self.state:
+            logger.warning(f"Circuit breaker {self._name}: {self.state} -> {state}")
+            metrics.counter("llm_breaker_transitions_total", {"to": state}).inc()
+        self.state = state
+        self._state_gauge.set(self.STATES.index(state))
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._set("half_open")
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_in_flight = False
+            self._set("closed")
+
+    def release(self):
+        """The allowed call was never made: let another probe through."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set("open")
+
+
+class ResilientLLMClient:
+    """Call ``call(prompt, timeout)`` with retries, hedging and a breaker.
+
+    ``hedge`` sends one duplicate request when the first has not returned
+    after the observed p95 latency (once ``hedge_min_samples`` calls have
+    been seen); whichever finishes first wins.
+
+    With a ``scheduler`` every attempt, hedges included, first waits for its
+    share of the provider quota (``output_tokens`` are added to the prompt
+    estimate); a hedge is only sent if the quota allows it right away.
+    """
+
+    def __init__(self, call: Callable[[str, float], str], timeout: float = 20.0,
+                 max_attempts: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 hedge: bool = False, hedge_quantile: float = 0.95, hedge_min_samples: int = 20,
+                 breaker: Optional[CircuitBreaker] = None, max_workers: int = 32,
+                 scheduler: Optional[RateLimiter] = None, output_tokens: int = 256):
+        self.call = call
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.scheduler = scheduler
+        self.output_tokens = output_tokens
+        self._latencies = deque(maxlen=256)
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="llm")
+        self._latency = metrics.histogram("llm_call_seconds")
+
+    def expected_latency(self, default: float = 2.0) -> float:
+        if not self._latencies:
+            return default
+        s = sorted(self._latencies)
+        return s[len(s) // 2]
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self._latencies) < self.hedge_min_samples:
+            return None
+        s = sorted(self._latencies)
+        return s[min(len(s) - 1, int(self.hedge_quantile * len(s)))]
+
+    def generate(self, prompt: str, deadline: Optional[float] = None) -> str:
+        """Return the model text or raise LLMError. ``deadline`` is a time.monotonic() value."""
+        last_exc: Optional[BaseException] = None
+        for attempt in range(self.max_attempts):
+            remaining = self.timeout if deadline is None else min(self.timeout, deadline - time.monotonic())
+            if remaining <= 0:
+                metrics.counter("llm_calls_total", {"outcome": "deadline"}).inc()
+                raise LLMTimeout("request deadline exhausted") from last_exc
+            if not self.breaker.allow():
+                metrics.counter("llm_calls_total", {"outcome": "circuit_open"}).inc()
+                raise CircuitOpenError("LLM circuit breaker is open") from last_exc
+            if attempt:
+                metrics.counter("llm_retries_total").inc()
+            try:
+                if self.scheduler:
+                    # The quota wait counts against the request deadline, not the call timeout
+                    self.scheduler.acquire(self._tokens(prompt),
+                                           timeout=None if deadline is None else deadline - time.monotonic())
+                    remaining = self.timeout if deadline is None else min(self.timeout, deadline - time.monotonic())
+                text = self._attempt(prompt, remaining)
+            except RateLimitTimeout as e:
+                self.breaker.release()
+                metrics.counter("llm_calls_total", {"outcome": "deadline"}).inc()
+                raise LLMTimeout(str(e)) from e
+            except Exception as e:
+                last_exc = e
+                if self.scheduler and is_throttle(e):
+                    self.scheduler.throttled()
+                if not is_retryable(e):
+                    # Caller-side errors (bad request, blocked prompt) say nothing about backend health
+                    self.breaker.release()
+                    metrics.counter("llm_calls_total", {"outcome": "error"}).inc()
+                    raise LLMError(str(e)) from e
+                self.breaker.record_failure()
+                logger.warning(f"LLM attempt {attempt + 1}/{self.max_attempts} failed: {e}")
+                if attempt + 1 < self.max_attempts:
+                    sleep = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                    if deadline is not None:
+                        sleep = min(sleep, max(0.0, deadline - time.monotonic()))
+                    metrics.histogram("llm_backoff_seconds").observe(sleep)
+                    time.sleep(sleep)
+                continue
+            self.breaker.record_success()
+            metrics.counter("llm_calls_total", {"outcome": "ok"}).inc()
+            return text
+        metrics.counter("llm_calls_total", {"outcome": "exhausted"}).inc()
+        raise (LLMTimeout if isinstance(last_exc, LLMTimeout) else LLMError)(f"LLM failed after {self.max_attempts} attempts: {last_exc}") from last_exc
+
+    def _tokens(self, prompt: str) -> int:
+        return estimate_tokens(prompt) + self.output_tokens
+
+    def _attempt(self, prompt: str, timeout: float) -> str:
+        metrics.counter("llm_attempts_total").inc()
+        start = time.monotonic()
+        end = start + timeout
+        futures = [self._pool.submit(self.call, prompt, timeout)]
+        delay = self.hedge_delay()
+        if delay is not None and delay < timeout:
+            done, _ = wait(futures, timeout=delay)
+            if not done and (not self.scheduler or self.scheduler.try_acquire(self._tokens(prompt))):
+                metrics.counter("llm_hedges_total").inc()
+                futures.append(self._pool.submit(self.call, prompt, end - time.monotonic()))
+        pending, exc = set(futures), None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, end - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for f in done:
+                if f.exception() is None:
+                    if f is not futures[0]:
+                        metrics.counter("llm_hedge_wins_total").inc()
+                    elapsed = time.monotonic() - start
+                    self._latencies.append(elapsed)
+                    self._latency.observe(elapsed)
+                    return f.result()
+                exc = f.exception()
+        if exc is not None and not pending:
+            raise exc
+        metrics.counter("llm_timeouts_total").inc()
+        raise LLMTimeout(f"LLM call exceeded {timeout:.1f}s")
@@ -0,0 +1,503 @@
+# Load-test harness for /hackrx/run that runs entirely on one box, offline.
+#
+#   python loadtest.py stubs                      # PDF server + fake Gemini only
+#   python loadtest.py run --spawn-app            # stubs + uvicorn main:app + ramp
+#   python loadtest.py run --target http://127.0.0.1:8000 --mix recorded.jsonl
+#   python loadtest.py quota --llm-rpm 60 --llm-tpm 40000    # LLM scheduler vs a rate-limited stub
+#
+# The app is pointed at the fake Gemini through GEMINI_API_ENDPOINT. The
+# embedding model must already be in the local Hugging Face cache
+# (HF_HUB_OFFLINE=1 is set for the spawned app).
+
+import argparse, json, os, random, re, subprocess, sys, threading, time
+import urllib.request, urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+DEFAULT_TOKEN = "c0df38f44acb385ecd42f8e0c02ee14acd6d145835643ee57acd84f79afeb798"
+
+CLAUSES = [
+    "A grace period of thirty days is provided for premium payment after the due date.",
+    "There is a waiting period of thirty-six months of continuous coverage for pre-existing diseases.",
+    "The policy covers maternity expenses after twenty-four months of continuous coverage.",
+    "Cataract surgery is covered after a waiting period of two years.",
+    "Organ donor expenses are covered when the organ is for an insured person.",
+    "A no claim discount of five percent is offered on renewal for a claim-free year.",
+    "Preventive health check-ups are reimbursed at the end of every block of two policy years.",
+    "A hospital is defined as an institution with at least ten inpatient beds.",
+    "AYUSH treatments are covered up to the sum insured in an AYUSH hospital.",
+    "Room rent for Plan A is capped at one percent of the sum insured per day.",
+]
+QUESTIONS = [
+    "What is the grace period for premium payment?",
+    "What is the waiting period for pre-existing diseases?",
+    "Does this policy cover maternity expenses?",
+    "What is the waiting period for cataract surgery?",
+    "Are the medical expenses for an organ donor covered?",
+    "What is the No Claim Discount offered in this policy?",
+    "Is there a benefit for preventive health check-ups?",
+    "How does the policy define a Hospital?",
+    "What is the extent of coverage for AYUSH treatments?",
+    "Are there any sub-limits on room rent for Plan A?",
+]
+
+
+# ---------------------------------------------------------------- test PDFs
+
+def make_pdf(pages: List[str], image_kb: int = 0) -> bytes:
+    """Build a minimal PDF (Helvetica, one content stream per page).
+
+    With ``image_kb`` every page also draws an incompressible grayscale image
+    of that size, like the scans and logos that make up most of a real policy's bytes.
+    """
+    def esc(line: str) -> str:
+        return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objs = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+            "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids, rnd = [], random.Random(0)
+    for text in pages:
+        ops = ["BT /F1 10 Tf 12 TL 50 790 Td"]
+        ops += [f"({esc(line)}) Tj T*" for line in text.split("\n")]
+        ops.append("ET")
+        xobjects = ""
+        if image_kb:
+            pixels = bytes(rnd.getrandbits(8) for _ in range(image_kb * 1024)).decode("latin-1")
+            objs.append(f"<< /Type /XObject /Subtype /Image /Width 1024 /Height {image_kb} "
+                        f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Length {len(pixels)} >>\n"
+                        f"stream\n{pixels}\nendstream")
+            xobjects = f" /XObject << /Im1 {len(objs)} 0 R >>"
+            ops.append("q 100 0 0 100 400 50 cm /Im1 Do Q")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        objs.append(f"<< /Length {len(stream)} >>\nstream\n" + stream.decode("latin-1") + "\nendstream")
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                    f"/Resources << /Font << /F1 3 0 R >>{xobjects} >> /Contents {len(objs)} 0 R >>")
+        kids.append(f"{len(objs)} 0 R")
+    objs[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for i, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def policy_pages(n_pages: int, seed: int = 0, lines_per_page: int = 40) -> List[str]:
+    """Synthetic policy text with the running header/footer real insurance PDFs carry."""
+    rnd = random.Random(seed)
+    pages = []
+    for p in range(1, n_pages + 1):
+        lines = ["National Insurance Co. Ltd. | Arogya Sanjeevani Policy | UIN: NICHLIP25041V012425"]
+        lines += [f"{p}.{i} {rnd.choice(CLAUSES)}" for i in range(1, lines_per_page + 1)]
+        lines.append(f"Page {p} of {n_pages}")
+        pages.append("\n".join(lines))
+    return pages
+
+
+class PDFHandler(BaseHTTPRequestHandler):
+    # /doc/<pages>.pdf or /doc/<pages>-<seed>.pdf are generated on demand;
+    # anything else is looked up in --pdf-dir.
+    pdf_dir: Optional[str] = None
+    _cache: Dict[str, bytes] = {}
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        m = re.fullmatch(r"/doc/(\d+)(?:-(\d+))?\.pdf", path)
+        body = None
+        if m:
+            body = self._cache.get(path)
+            if body is None:
+                body = make_pdf(policy_pages(int(m.group(1)), int(m.group(2) or 0)))
+                self._cache[path] = body
+        elif self.pdf_dir:
+            name = os.path.basename(path)
+            full = os.path.join(self.pdf_dir, name)
+            if name and os.path.isfile(full):
+                with open(full, "rb") as f:
+                    body = f.read()
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+# ---------------------------------------------------------- fake Gemini API
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    # Speaks enough of the v1beta REST API for genai's "rest" transport:
+    # POST /v1beta/models/<model>:generateContent
+    latency_ms = 800.0
+    jitter_ms = 200.0
+    error_rate = 0.0      # fraction of calls answered with 500
+    throttle_rate = 0.0   # fraction of calls answered with 429
+    rpm_limit = 0         # quotas over a sliding minute, answered with 429 (0: none)
+    tpm_limit = 0
+    stats = {"calls": 0, "errors": 0, "throttled": 0}
+    _window: List[tuple] = []  # (time, prompt tokens) of the calls accepted in the last minute
+    _lock = threading.Lock()
+
+    def over_quota(self, tokens: int) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            window = FakeGeminiHandler._window = [(t, n) for t, n in self._window if t > now - 60]
+            if ((self.rpm_limit and len(window) >= self.rpm_limit)
+                    or (self.tpm_limit and sum(n for _, n in window) + tokens > self.tpm_limit)):
+                return True
+            window.append((now, tokens))
+            return False
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if not re.search(r"/models/[^/:]+:(generateContent|countTokens)$", self.path.split("?")[0]):
+            self.send_error(404)
+            return
+        with self._lock:
+            self.stats["calls"] += 1
+        prompt = "".join(p.get("text", "") for c in payload.get("contents", [])
+                         for p in c.get("parts", []))
+        quota_exceeded = self.over_quota(len(prompt) // 4)
+        delay = max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+        time.sleep(0.05 if quota_exceeded else delay)
+
+        roll = random.random()
+        if quota_exceeded or roll < self.throttle_rate:
+            with self._lock:
+                self.stats["throttled"] += 1
+            return self._json(429, {"error": {"code": 429, "message": "Resource has been exhausted",
+                                              "status": "RESOURCE_EXHAUSTED"}})
+        if roll < self.throttle_rate + self.error_rate:
+            with self._lock:
+                self.stats["errors"] += 1
+            return self._json(500, {"error": {"code": 500, "message": "Internal error",
+                                              "status": "INTERNAL"}})
+
+        if self.path.split("?")[0].endswith(":countTokens"):
+            return self._json(200, {"totalTokens": max(1, len(prompt) // 4)})
+        m = re.search(r"Question:\s*(.*?)\s*\nAnswer:", prompt, re.S)
+        answer = f"Stub answer to: {m.group(1) if m else 'unknown question'}"
+        self._json(200, {
+            "candidates": [{"content": {"parts": [{"text": answer}], "role": "model"},
+                            "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4,
+                              "candidatesTokenCount": len(answer) // 4,
+                              "totalTokenCount": (len(prompt) + len(answer)) // 4},
+        })
+
+    def _json(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(handler, port: int) -> ThreadingHTTPServer:
+    srv = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def start_stubs(args):
+    PDFHandler.pdf_dir = args.pdf_dir
+    FakeGeminiHandler.latency_ms = args.llm_latency_ms
+    FakeGeminiHandler.jitter_ms = args.llm_jitter_ms
+    FakeGeminiHandler.error_rate = args.llm_error_rate
+    FakeGeminiHandler.throttle_rate = args.llm_429_rate
+    FakeGeminiHandler.rpm_limit = args.llm_rpm
+    FakeGeminiHandler.tpm_limit = args.llm_tpm
+    pdf_srv = start_server(PDFHandler, args.pdf_port)
+    llm_srv = start_server(FakeGeminiHandler, args.llm_port)
+    return (f"http://127.0.0.1:{pdf_srv.server_address[1]}",
+            f"http://127.0.0.1:{llm_srv.server_address[1]}")
+
+
+def spawn_app(llm_url: str, port: int, extra_env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    env = dict(os.environ, GEMINI_API_ENDPOINT=llm_url, HF_HUB_OFFLINE="1",
+               TRANSFORMERS_OFFLINE="1", **(extra_env or {}))
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                             "--port", str(port), "--log-level", "warning"],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    deadline = time.time() + 180
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"app exited with code {proc.returncode}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return proc
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("app did not become healthy in time")
+
+
+def quota_run(llm_url: str, args, scheduled: bool) -> dict:
+    """Fire ``args.calls`` LLM calls at once, alternating interactive and
+    batch priority, through a ResilientLLMClient with or without the scheduler."""
+    from llm_client import LLMError, ResilientLLMClient
+    from rate_limit import RateLimiter, current_priority
+
+    def call(prompt: str, timeout: float) -> str:
+        body = json.dumps({"contents": [{"parts": [{"text": prompt}]}]}).encode()
+        req = urllib.request.Request(f"{llm_url}/v1beta/models/stub:generateContent", data=body,
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read())["candidates"][0]["content"]["parts"][0]["text"]
+
+    scheduler = RateLimiter(args.llm_rpm, args.llm_tpm) if scheduled else None
+    client = ResilientLLMClient(call, timeout=30.0, max_attempts=args.attempts, scheduler=scheduler,
+                                max_workers=args.calls)
+    FakeGeminiHandler._window = []
+    FakeGeminiHandler.stats = {"calls": 0, "errors": 0, "throttled": 0}
+    latencies = {"interactive": [], "batch": []}
+
+    def one(i: int):
+        priority = "batch" if i % 2 else "interactive"
+        current_priority.set(priority)
+        context = " ".join(CLAUSES[(i + j) % len(CLAUSES)] for j in range(args.prompt_clauses))
+        start = time.perf_counter()
+        try:
+            client.generate(f"Context:\n\n{context}\n\nQuestion: {QUESTIONS[i % len(QUESTIONS)]}\nAnswer:")
+            latencies[priority].append(time.perf_counter() - start)
+        except LLMError:
+            pass
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.calls) as pool:
+        list(pool.map(one, range(args.calls)))
+    elapsed = time.perf_counter() - start
+    ok = sum(len(v) for v in latencies.values())
+    return {"scheduler": scheduled, "calls": args.calls, "ok": ok, "failed": args.calls - ok,
+            "stub_429s": FakeGeminiHandler.stats["throttled"], "elapsed_s": round(elapsed, 2),
+            "ok_per_minute": round(60 * ok / elapsed, 1),
+            **{f"{p}_p50_s": round(percentile(v, 50), 2) for p, v in latencies.items()},
+            **{f"{p}_p95_s": round(percentile(v, 95), 2) for p, v in latencies.items()}}
+
+
+# ------------------------------------------------------------------ driver
+
+def load_mix(path: Optional[str], pdf_url: str, pages: int, questions: int) -> List[dict]:
+    """Request mix: a recorded JSONL (REQUEST_LOG_PATH) or a synthetic default.
+
+    ``local://<pages>`` or ``local://<pages>-<seed>`` documents resolve to the
+    stub PDF server, so recorded mixes can be rewritten to run offline.
+    """
+    if path:
+        mix = []
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    mix.append(json.loads(line))
+    else:
+        mix = [{"documents": f"local://{pages}-{i}",
+                "questions": [QUESTIONS[j % len(QUESTIONS)] for j in range(questions)]}
+               for i in range(4)]
+    for item in mix:
+        if item["documents"].startswith("local://"):
+            item["documents"] = f"{pdf_url}/doc/{item['documents'][len('local://'):]}.pdf"
+    return mix
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = (len(s) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(s) - 1)
+    return s[lo] + (s[hi] - s[lo]) * (k - lo)
+
+
+def send(target: str, item: dict, timeout: float) -> tuple:
+    body = json.dumps({"documents": item["documents"], "questions": item["questions"]}).encode()
+    headers = {"Content-Type": "application/json",
+               "Authorization": f"Bearer {item.get('token', DEFAULT_TOKEN)}"}
+    if item.get("request_timeout"):
+        headers["X-Request-Timeout"] = str(item["request_timeout"])
+    req = urllib.request.Request(f"{target}/hackrx/run", data=body, method="POST", headers=headers)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return time.perf_counter() - start, status
+
+
+def summarize(concurrency: int, elapsed: float, samples: List[tuple]) -> dict:
+    ok = [lat for lat, status in samples if status == 200]
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "error_rate": round(1 - len(ok) / len(samples), 4) if samples else 0.0,
+        "p50_s": round(percentile(ok, 50), 3),
+        "p90_s": round(percentile(ok, 90), 3),
+        "p99_s": round(percentile(ok, 99), 3),
+        "statuses": {str(s): sum(1 for _, st in samples if st == s) for s in sorted({st for _, st in samples})},
+    }
+
+
+def run_stage(target: str, mix: List[dict], concurrency: int, duration: float, timeout: float) -> dict:
+    # Closed loop: each worker sends its next request as soon as the last one returns.
+    samples, lock, counter = [], threading.Lock(), iter(range(1 << 62))
+    stop_at = time.perf_counter() + duration
+
+    def worker():
+        while time.perf_counter() < stop_at:
+            with lock:
+                item = mix[next(counter) % len(mix)]
+            result = send(target, item, timeout)
+            with lock:
+                samples.append(result)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return summarize(concurrency, time.perf_counter() - start, samples)
+
+
+def replay(target: str, mix: List[dict], speed: float, timeout: float, max_workers: int = 256) -> dict:
+    # Open loop: keep the recorded inter-arrival gaps (scaled by --speed).
+    t0 = mix[0].get("ts", 0.0)
+    samples, lock = [], threading.Lock()
+
+    def fire(item):
+        result = send(target, item, timeout)
+        with lock:
+            samples.append(result)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers) as pool:
+        for item in mix:
+            delay = (item.get("ts", t0) - t0) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, item)
+    return summarize(max_workers, time.perf_counter() - start, samples)
+
+
+def ramp(args, target: str, mix: List[dict]) -> List[dict]:
+    curve, baseline = [], None
+    for c in args.concurrency:
+        stage = run_stage(target, mix, c, args.duration, args.timeout)
+        curve.append(stage)
+        print(f"c={c:<4} rps={stage['throughput_rps']:<8} p50={stage['p50_s']:<7} "
+              f"p99={stage['p99_s']:<7} err={stage['error_rate']:.2%}", flush=True)
+        baseline = baseline or stage["p99_s"] or None
+        if stage["error_rate"] > args.max_error_rate:
+            print(f"stopping: error rate above {args.max_error_rate:.0%}")
+            break
+        if baseline and stage["p99_s"] > baseline * args.collapse_factor:
+            print(f"stopping: p99 above {args.collapse_factor}x the single-client p99")
+            break
+    return curve
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline load-test harness for /hackrx/run")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("stubs", "run", "quota"):
+        p = sub.add_parser(name)
+        p.add_argument("--pdf-port", type=int, default=9000)
+        p.add_argument("--pdf-dir", help="extra PDFs served as /doc/<file name>")
+        p.add_argument("--llm-port", type=int, default=9100)
+        p.add_argument("--llm-latency-ms", type=float, default=800.0)
+        p.add_argument("--llm-jitter-ms", type=float, default=200.0)
+        p.add_argument("--llm-error-rate", type=float, default=0.0)
+        p.add_argument("--llm-429-rate", type=float, default=0.0)
+        p.add_argument("--llm-rpm", type=int, default=60 if name == "quota" else 0,
+                       help="requests per minute before the stub answers 429")
+        p.add_argument("--llm-tpm", type=int, default=40000 if name == "quota" else 0,
+                       help="prompt tokens per minute before the stub answers 429")
+    quota = sub.choices["quota"]
+    quota.set_defaults(llm_latency_ms=300.0, llm_jitter_ms=100.0)
+    quota.add_argument("--calls", type=int, default=80, help="more than a minute's quota")
+    quota.add_argument("--attempts", type=int, default=3, help="LLM_MAX_ATTEMPTS of the client")
+    quota.add_argument("--prompt-clauses", type=int, default=20, help="prompt size, in policy clauses")
+    quota.add_argument("--out", help="write both runs as JSON here")
+    run = sub.choices["run"]
+    run.add_argument("--target", default="http://127.0.0.1:8000")
+    run.add_argument("--spawn-app", action="store_true", help="start uvicorn main:app against the stubs")
+    run.add_argument("--app-port", type=int, default=8000)
+    run.add_argument("--mix", help="JSONL request mix, e.g. a REQUEST_LOG_PATH recording")
+    run.add_argument("--replay", action="store_true", help="replay --mix with its recorded timing")
+    run.add_argument("--speed", type=float, default=1.0, help="replay time compression factor")
+    run.add_argument("--pages", type=int, default=20)
+    run.add_argument("--questions", type=int, default=5)
+    run.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")],
+                     default=[1, 2, 4, 8, 16, 32])
+    run.add_argument("--duration", type=float, default=30.0, help="seconds per ramp stage")
+    run.add_argument("--timeout", type=float, default=120.0)
+    run.add_argument("--collapse-factor", type=float, default=5.0)
+    run.add_argument("--max-error-rate", type=float, default=0.2)
+    run.add_argument("--out", help="write the curve as JSON here")
+    args = ap.parse_args(argv)
+
+    pdf_url, llm_url = start_stubs(args)
+    print(f"PDF server: {pdf_url}/doc/<pages>.pdf  fake Gemini: {llm_url}", flush=True)
+    if args.cmd == "stubs":
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            return
+    if args.cmd == "quota":
+        # Each run starts with a fresh quota window; the scheduled one must see no 429s
+        runs = [quota_run(llm_url, args, scheduled=False)]
+        time.sleep(1)
+        runs.append(quota_run(llm_url, args, scheduled=True))
+        for r in runs:
+            print(json.dumps(r))
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(runs, f, indent=2)
+        passed = runs[1]["stub_429s"] == 0 and runs[1]["failed"] == 0
+        print("PASS: no 429s with the scheduler" if passed else "FAIL: 429s or failed calls with the scheduler")
+        sys.exit(0 if passed else 1)
+
+    app = spawn_app(llm_url, args.app_port) if args.spawn_app else None
+    target = f"http://127.0.0.1:{args.app_port}" if app else args.target
+    try:
+        mix = load_mix(args.mix, pdf_url, args.pages, args.questions)
+        if args.replay:
+            result = {"replay": replay(target, mix, args.speed, args.timeout)}
+            print(json.dumps(result["replay"], indent=2))
+        else:
+            result = {"curve": ramp(args, target, mix)}
+            healthy = [s for s in result["curve"] if s["error_rate"] <= args.max_error_rate]
+            if healthy:
+                best = max(healthy, key=lambda s: s["throughput_rps"])
+                print(f"peak: {best['throughput_rps']} req/s at concurrency {best['concurrency']}")
+        result["llm_stub"] = dict(FakeGeminiHandler.stats)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(result, f, indent=2)
+    finally:
+        if app:
+            app.terminate()
+            app.wait()
+
+
+if __name__ == "__main__":
+    main()
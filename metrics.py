@@ -0,0 +1,128 @@
+# Minimal in-process metrics registry, exposed in Prometheus text format at /metrics.
+
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+_lock = threading.Lock()
+_metrics: Dict[str, "_Metric"] = {}
+
+
+def _key(name: str, labels: Optional[Dict[str, str]]) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, labels: Optional[Dict[str, str]]):
+        self.name = name
+        self.key = _key(name, labels)
+        self._lock = threading.Lock()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, labels=None):
+        super().__init__(name, labels)
+        self.value = 0.0
+
+    def inc(self, n: float = 1.0):
+        with self._lock:
+            self.value += n
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, labels=None):
+        super().__init__(name, labels)
+        self.value = 0.0
+
+    def set(self, v: float):
+        self.value = v
+
+    def inc(self, n: float = 1.0):
+        with self._lock:
+            self.value += n
+
+    def dec(self, n: float = 1.0):
+        self.inc(-n)
+
+
+class Histogram(_Metric):
+    # Count and sum over the process lifetime, quantiles over a sliding window.
+    kind = "summary"
+
+    def __init__(self, name, labels=None, window: int = 1024):
+        super().__init__(name, labels)
+        self.count, self.sum = 0, 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, v: float):
+        with self._lock:
+            self.count += 1
+            self.sum += v
+            self.samples.append(v)
+
+    def quantile(self, q: float) -> float:
+        with self._lock:
+            s = sorted(self.samples)
+        return s[min(len(s) - 1, int(q * len(s)))] if s else 0.0
+
+
+def _get(cls, name: str, labels: Optional[Dict[str, str]]):
+    key = _key(name, labels)
+    m = _metrics.get(key)
+    if m is None:
+        with _lock:
+            m = _metrics.setdefault(key, cls(name, labels))
+    return m
+
+
+def counter(name: str, labels: Optional[Dict[str, str]] = None) -> Counter:
+    return _get(Counter, name, labels)
+
+
+def gauge(name: str, labels: Optional[Dict[str, str]] = None) -> Gauge:
+    return _get(Gauge, name, labels)
+
+
+def histogram(name: str, labels: Optional[Dict[str, str]] = None) -> Histogram:
+    return _get(Histogram, name, labels)
+
+
+def snapshot() -> Dict[str, float]:
+    out = {}
+    for key, m in list(_metrics.items()):
+        if isinstance(m, Histogram):
+            out[key + ":count"] = m.count
+            out[key + ":sum"] = round(m.sum, 6)
+            for q in (0.5, 0.95, 0.99):
+                out[f"{key}:p{int(q * 100)}"] = round(m.quantile(q), 6)
+        else:
+            out[key] = m.value
+    return out
+
+
+def render() -> str:
+    lines, typed = [], set()
+    for key, m in sorted(_metrics.items()):
+        if m.name not in typed:
+            typed.add(m.name)
+            lines.append(f"# TYPE {m.name} {m.kind}")
+        if isinstance(m, Histogram):
+            base, _, labels = key.partition("{")
+            labels = labels.rstrip("}")
+            for q in (0.5, 0.95, 0.99):
+                ql = f'quantile="{q}"' + ("," + labels if labels else "")
+                lines.append(f"{base}{{{ql}}} {m.quantile(q)}")
+            suffix = "{" + labels + "}" if labels else ""
+            lines.append(f"{base}_count{suffix} {m.count}")
+            lines.append(f"{base}_sum{suffix} {m.sum}")
+        else:
+            lines.append(f"{key} {m.value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,61 @@
+# Text normalization between extraction and chunking: running headers,
+# footers and disclaimers repeated on every page are dropped, words hyphenated
+# across line breaks are rejoined and whitespace is collapsed.
+
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"[ \t\f\v\u00a0]+")
+_HYPHEN_BREAK = re.compile(r"(\w)-\n\s*([a-z])")
+_BLANK_RUNS = re.compile(r"\n{3,}")
+
+
+def line_key(line: str) -> str:
+    # "Page 3 of 50" and "Page 4 of 50" are the same footer
+    return _DIGITS.sub("#", _SPACES.sub(" ", line).strip().lower())
+
+
+def _edge_slots(lines: List[str], edge: int) -> Dict[int, tuple]:
+    # Running headers and footers sit at a fixed distance from the top or bottom
+    # of the page, so that position is part of the key.
+    filled = [i for i, l in enumerate(lines) if line_key(l)]
+    slots = {i: ("bottom", n) for n, i in enumerate(reversed(filled[-edge:]))}
+    slots.update({i: ("top", n) for n, i in enumerate(filled[:edge])})
+    return slots
+
+
+def boilerplate_lines(pages: List[str], min_fraction: float = 0.6, min_pages: int = 6,
+                      edge: int = 3) -> set:
+    """(side, offset, key) of lines among the first/last ``edge`` lines of at least ``min_fraction`` of the pages.
+
+    Only page edges are considered: a clause that is legitimately restated in
+    the body of many pages must survive.
+    """
+    if len(pages) < min_pages:
+        return set()
+    seen = Counter()
+    for page in pages:
+        lines = page.splitlines()
+        seen.update({slot + (line_key(lines[i]),) for i, slot in _edge_slots(lines, edge).items()})
+    threshold = max(2, min_fraction * len(pages))
+    return {key for key, n in seen.items() if n >= threshold}
+
+
+def clean_page(text: str, boilerplate: set, edge: int = 3) -> str:
+    lines = text.splitlines()
+    slots = _edge_slots(lines, edge)
+    lines = [l for i, l in enumerate(lines) if i not in slots or slots[i] + (line_key(l),) not in boilerplate]
+    text = "\n".join(_SPACES.sub(" ", l).strip() for l in lines)
+    text = _HYPHEN_BREAK.sub(r"\1\2", text)
+    return _BLANK_RUNS.sub("\n\n", text).strip() + "\n"
+
+
+def normalize_pages(pages: List[str], min_fraction: float = 0.6) -> Tuple[List[str], Dict[str, int]]:
+    """Cleaned page texts and a report of what was removed."""
+    boilerplate = boilerplate_lines(pages, min_fraction)
+    cleaned = [clean_page(p, boilerplate) for p in pages]
+    before, after = sum(map(len, pages)), sum(map(len, cleaned))
+    return cleaned, {"boilerplate_lines": len({k for _, _, k in boilerplate}), "chars_removed": before - after,
+                     "chars_kept": after}
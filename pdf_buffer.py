@@ -0,0 +1,127 @@
+# PDF bytes written once to a temp file and mapped read-only, so a document
+# is not held in memory as the response body, a BytesIO copy and a parser
+# cache at the same time; extractors read the pages they need from the map.
+
+import hashlib, io, mmap, os, tempfile
+from typing import Iterable, Optional
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable file view over a shared buffer; each reader has its own position."""
+
+    def __init__(self, buf):
+        self._view = memoryview(buf)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+class PdfBuffer:
+    """Append bytes with ``write``, then ``finish`` to get a read-only mmap.
+
+    The file lives in ``directory`` (default: the system temp dir) and is
+    unlinked by ``close`` (unless it was mapped in place with ``open``);
+    ``sha256`` (unless ``hashed`` is False, for callers that hash
+    themselves) and ``size`` are computed while writing.
+    """
+
+    def __init__(self, directory: Optional[str] = None, hashed: bool = True):
+        fd, self.path = tempfile.mkstemp(suffix=".pdf", dir=directory)
+        self._file = os.fdopen(fd, "wb")
+        self._hash = hashlib.sha256() if hashed else None
+        self.size = 0
+        self.sha256: Optional[str] = None
+        self.map: Optional[mmap.mmap] = None
+        self._owned = True
+
+    @classmethod
+    def open(cls, path: str) -> "PdfBuffer":
+        """Map an existing file in place, hashing it once; ``close`` leaves it on disk."""
+        buf = cls.__new__(cls)
+        buf.path, buf._owned, buf._hash = path, False, hashlib.sha256()
+        buf.size, buf.sha256, buf.map = 0, None, None
+        with open(path, "rb") as buf._file:
+            for chunk in iter(lambda: buf._file.read(1 << 20), b""):
+                buf._hash.update(chunk)
+                buf.size += len(chunk)
+        buf.finish()
+        return buf
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[bytes], max_bytes: Optional[int] = None,
+                    directory: Optional[str] = None) -> "PdfBuffer":
+        buf = cls(directory)
+        try:
+            for chunk in chunks:
+                buf.write(chunk)
+                if max_bytes is not None and buf.size > max_bytes:
+                    raise ValueError(f"PDF larger than {max_bytes} bytes")
+            buf.finish()
+        except BaseException:
+            buf.close()
+            raise
+        return buf
+
+    def write(self, chunk: bytes):
+        if self._hash is not None:
+            self._hash.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def finish(self) -> mmap.mmap:
+        self._file.close()
+        if self._hash is not None:
+            self.sha256 = self._hash.hexdigest()
+        if not self.size:
+            raise ValueError("empty PDF")
+        with open(self.path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass  # a reader still holds a view; the mapping goes when it is collected
+        if not self._owned:
+            return
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def as_buffer(data):
+    """The bytes-like view of ``data`` (PDF bytes or a PdfBuffer)."""
+    return data.map if isinstance(data, PdfBuffer) else data
@@ -0,0 +1,189 @@
+# Compressed per-document vector indexes: float16 or int8 scalar quantization,
+# product quantization, and optional PCA dimension reduction in front of any
+# of them. Stored embeddings stay float32, so a deployment can switch codecs
+# and rebuild its indexes from the document store.
+#
+#   python quantize.py --store ./doc_store --codec pq --pca-dim 192 --out codec.faiss
+
+import argparse, glob, logging, math, os
+from typing import Optional
+
+import numpy as np
+
+from shards import knn
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CODECS = ("flat", "fp16", "int8", "pq")
+
+
+class VectorCodec:
+    """Builds the per-document search index for one storage setting.
+
+    PQ and PCA need training. With ``template`` (the path of a trained, empty
+    index written by ``train``) every document keeps only its codes, encoded
+    with the shared codebooks, and ``mode``/``pca_dim`` come from the
+    template. Otherwise they are trained on each document's own vectors and
+    every document carries its own codebooks: a document with few chunks gets
+    fewer PQ centroids, or int8 below 16 chunks, and no PCA below ``pca_dim``
+    chunks.
+    """
+
+    def __init__(self, mode: str = "flat", pca_dim: int = 0, pq_m: int = 48, pq_bits: int = 8,
+                 template: Optional[str] = None):
+        if mode not in CODECS:
+            raise ValueError(f"Unknown vector codec {mode!r}; expected one of {', '.join(CODECS)}")
+        if mode not in ("flat", "fp16") and not FAISS_AVAILABLE:
+            logger.warning(f"Vector codec {mode} needs FAISS; storing float32")
+        self.mode = mode
+        self.pca_dim = pca_dim
+        self.pq_m = pq_m
+        self.pq_bits = pq_bits
+        self.template = None
+        if template and FAISS_AVAILABLE:
+            self.use_template(faiss.read_index(template))
+        elif (mode == "pq" or pca_dim) and FAISS_AVAILABLE:
+            logger.warning(f"Vector codec {self} is trained per document, and each document keeps its own "
+                           "codebooks; train shared ones with quantize.py")
+
+    def use_template(self, index):
+        """Encode documents with a trained index from ``train`` (or read from a file)."""
+        self.template = index
+        # Codes of an IndexPreTransform are codes of its inner index in the
+        # reduced space: search there rather than decoding back through the PCA
+        self._transforms, self._decoder = [], index
+        if isinstance(index, faiss.IndexPreTransform):
+            self._transforms = [faiss.downcast_VectorTransform(index.chain.at(i)) for i in range(index.chain.size())]
+            self._decoder = faiss.downcast_index(index.index)
+
+    def __str__(self) -> str:
+        if self.template is not None:
+            return "trained template"
+        return (f"pca{self.pca_dim}-" if self.pca_dim else "") + self.mode
+
+    def _quantizer(self, dim: int, n: Optional[int]):
+        if self.mode == "pq":
+            bits = self.pq_bits if n is None else min(self.pq_bits, int(math.log2(max(n, 1))))
+            if bits >= 4:
+                m = max(d for d in range(1, min(self.pq_m, dim) + 1) if dim % d == 0)
+                index = faiss.IndexPQ(dim, m, bits)
+                index.pq.cp.min_points_per_centroid = 1  # per-document samples are small by design
+                return index
+        if self.mode in ("int8", "pq"):
+            return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+        if self.mode == "fp16":
+            return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16)
+        return faiss.IndexFlatL2(dim)
+
+    def empty(self, dim: int, n: Optional[int] = None):
+        """An untrained index for ``dim``-dimensional vectors; ``n`` is the
+        number of training vectors at hand (None: enough for the full setting)."""
+        if self.pca_dim and self.pca_dim < dim and (n is None or n >= self.pca_dim):
+            return faiss.IndexPreTransform(faiss.PCAMatrix(dim, self.pca_dim), self._quantizer(self.pca_dim, n))
+        return self._quantizer(dim, n)
+
+    def applied(self, index) -> str:
+        """The setting a built index actually got, named like ``str(codec)``:
+        per-document training falls back on small documents (``pq6bit``: PQ
+        with fewer bits than asked)."""
+        if not FAISS_AVAILABLE or isinstance(index, (np.ndarray, EncodedVectors)):
+            return str(self)
+        prefix = ""
+        if isinstance(index, faiss.IndexPreTransform):
+            prefix, index = f"pca{index.index.d}-", faiss.downcast_index(index.index)
+        if isinstance(index, faiss.IndexPQ):
+            return prefix + ("pq" if index.pq.nbits == self.pq_bits else f"pq{index.pq.nbits}bit")
+        if isinstance(index, faiss.IndexScalarQuantizer):
+            return prefix + ("fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "int8")
+        return prefix + "flat"
+
+    def build(self, embeddings: np.ndarray):
+        x = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if not FAISS_AVAILABLE:
+            return x.astype(np.float16) if self.mode == "fp16" else x
+        if self.template is not None:
+            return EncodedVectors(self, self.template.sa_encode(x))
+        index = self.empty(x.shape[1], len(x))
+        if not index.is_trained:
+            index.train(x)
+        index.add(x)
+        return index
+
+    def train(self, sample: np.ndarray):
+        """Codebooks (and PCA) trained once on a sample of the corpus, as an empty index."""
+        x = np.ascontiguousarray(sample, dtype=np.float32)
+        index = self.empty(x.shape[1])
+        index.train(x)
+        return index
+
+
+class EncodedVectors:
+    """One document's vectors as codes of a shared trained index (``sa_encode``).
+
+    The codebooks are held once per process. A search decodes the codes and
+    runs an exact search over the approximations.
+    """
+
+    def __init__(self, codec: VectorCodec, codes: np.ndarray):
+        self.codec = codec
+        self.codes = codes
+
+    @property
+    def ntotal(self) -> int:
+        return len(self.codes)
+
+    def search(self, queries: np.ndarray, k: int):
+        q = np.ascontiguousarray(queries, dtype=np.float32)
+        for transform in self.codec._transforms:
+            q = transform.apply(q)
+        return knn(q, self.codec._decoder.sa_decode(self.codes), k)
+
+
+def bytes_per_vector(index) -> float:
+    """Memory of an index per stored vector, its own codebooks included (shared ones are not)."""
+    if isinstance(index, np.ndarray):
+        return float(index.itemsize * index.shape[1])
+    if isinstance(index, EncodedVectors):
+        return float(index.codes.shape[1])
+    return len(faiss.serialize_index(index)) / max(1, index.ntotal)
+
+
+def stored_embeddings(directory: str) -> list:
+    """The embeddings of every document in a DOC_STORE_DIR, one array per document."""
+    paths = sorted(glob.glob(os.path.join(directory, "*", "embeddings.npy")))
+    return [np.load(p) for p in paths]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Train shared codebooks for VECTOR_CODEC_PATH")
+    ap.add_argument("--store", default=os.getenv("DOC_STORE_DIR"), help="document store to sample")
+    ap.add_argument("--codec", default="pq", choices=CODECS)
+    ap.add_argument("--pca-dim", type=int, default=0)
+    ap.add_argument("--pq-m", type=int, default=48)
+    ap.add_argument("--pq-bits", type=int, default=8)
+    ap.add_argument("--sample", type=int, default=100_000, help="training vectors at most")
+    ap.add_argument("--out", required=True)
+    args = ap.parse_args()
+    if not FAISS_AVAILABLE:
+        ap.error("training codebooks needs faiss")
+    if not args.store:
+        ap.error("--store (or DOC_STORE_DIR) is required")
+    vectors = np.concatenate(stored_embeddings(args.store) or [np.zeros((0, 1), np.float32)])
+    if len(vectors) > args.sample:
+        vectors = vectors[np.random.default_rng(0).choice(len(vectors), args.sample, replace=False)]
+    codec = VectorCodec(args.codec, args.pca_dim, args.pq_m, args.pq_bits)
+    needed = max(args.pca_dim, 2 ** args.pq_bits if args.codec == "pq" else 1)
+    if len(vectors) < needed:
+        ap.error(f"{len(vectors)} stored vectors; {codec} needs at least {needed} to train")
+    faiss.write_index(codec.train(vectors), args.out)
+    print(f"{codec} trained on {len(vectors)} vectors, written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
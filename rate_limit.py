@@ -0,0 +1,161 @@
+# Process-wide LLM scheduler: every call waits for its share of the provider's
+# requests-per-minute and tokens-per-minute quotas, interactive calls first.
+
+import contextvars, threading, time
+from collections import deque
+from typing import Dict, Optional
+
+import metrics
+
+# "interactive" (default) or "batch": background jobs and batch runs set it
+current_priority: contextvars.ContextVar = contextvars.ContextVar("llm_priority", default="interactive")
+
+
+class RateLimitTimeout(TimeoutError):
+    pass
+
+
+def estimate_tokens(prompt: str) -> int:
+    return max(1, len(prompt) // 4)
+
+
+class TokenBucket:
+    """Refills at ``rate`` per second up to ``capacity``. A take larger than
+    the capacity is allowed from a full bucket and leaves it in debt."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self._at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._at) * self.rate)
+        self._at = now
+
+    def wait_time(self, n: float, now: float) -> float:
+        self._refill(now)
+        need = min(n, self.capacity) - self.level
+        return max(0.0, need / self.rate)
+
+    def take(self, n: float, now: float):
+        self._refill(now)
+        self.level -= n
+
+    def drain(self, now: float):
+        self._refill(now)
+        self.level = min(self.level, 0.0)
+
+
+class RateLimiter:
+    """Paces LLM calls to ``rpm`` requests and ``tpm`` tokens per minute (0: no limit).
+
+    Buckets hold at most ``burst`` seconds of quota, so calls are spread
+    evenly instead of spending a minute's quota in a burst and then hitting
+    429s, and no 60-second window sees more than the quota. Waiters are
+    served in arrival order, with ``batch`` calls queued as if they had
+    arrived ``batch_delay`` seconds later: interactive calls go first, but
+    batch work is not starved. ``throttled()`` (a 429 from the
+    provider) pauses dispatch for ``retry_after`` seconds.
+    """
+
+    PRIORITIES = ("interactive", "batch")
+
+    def __init__(self, rpm: float = 0, tpm: float = 0, burst: float = 2.0, batch_delay: float = 30.0):
+        self.rpm, self.tpm, self.burst, self.batch_delay = rpm, tpm, burst, batch_delay
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._share = 1.0
+        self._limits(1.0)
+        self._waiters = []
+        self._seq = 0
+        self._paused_until = 0.0
+        self._window = deque()  # (time, tokens) of the calls dispatched in the last minute
+        self._cond = threading.Condition()
+        self._depth = {p: metrics.gauge("llm_scheduler_queue_depth", {"priority": p}) for p in self.PRIORITIES}
+        self._wait = {p: metrics.histogram("llm_scheduler_wait_seconds", {"priority": p}) for p in self.PRIORITIES}
+        self._use = {q: metrics.gauge("llm_quota_utilization", {"quota": q}) for q in ("requests", "tokens")}
+
+    def _limits(self, share: float):
+        self._buckets = {}
+        for quota, per_minute in (("requests", self.rpm * share), ("tokens", self.tpm * share)):
+            if per_minute > 0:
+                # A full bucket plus a minute of refill never exceeds the quota. A
+                # capacity below one request still lets a request out from a full
+                # bucket, into debt, so a whole request is held back from the refill;
+                # a share under 2/min gets one request per window at most
+                capacity = min(per_minute, per_minute * self.burst / 60)
+                held = max(capacity, 1.0) if quota == "requests" else capacity
+                self._buckets[quota] = TokenBucket(max(per_minute - held, per_minute / 2) / 60, capacity)
+
+    def share(self, fraction: float):
+        """Keep ``fraction`` of the quotas (one of several processes using the same API key)."""
+        with self._cond:
+            self._limits(fraction)
+            self._share = fraction
+
+    def _ready_in(self, tokens: int, now: float) -> float:
+        wait = max(0.0, self._paused_until - now)
+        for quota, bucket in self._buckets.items():
+            wait = max(wait, bucket.wait_time(1 if quota == "requests" else tokens, now))
+        return wait
+
+    def acquire(self, tokens: int, priority: Optional[str] = None, timeout: Optional[float] = None) -> float:
+        """Wait until a call of ``tokens`` estimated tokens may go out; returns the wait.
+        Raises RateLimitTimeout if that takes longer than ``timeout`` seconds."""
+        priority = priority or current_priority.get()
+        start = time.monotonic()
+        with self._cond:
+            self._seq += 1
+            me = (start + (self.batch_delay if priority == "batch" else 0.0), self._seq, priority)
+            self._waiters.append(me)
+            self._depth[priority].inc()
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._ready_in(tokens, now) if min(self._waiters) is me else None
+                    if wait == 0.0:
+                        self._dispatch(tokens, now)
+                        break
+                    left = None if timeout is None else start + timeout - now
+                    if left is not None and left <= 0:
+                        metrics.counter("llm_scheduler_timeouts_total", {"priority": priority}).inc()
+                        raise RateLimitTimeout(f"LLM quota wait exceeded {timeout:.1f}s")
+                    waits = [w for w in (wait, left) if w is not None]
+                    self._cond.wait(min(waits) if waits else None)
+            finally:
+                self._waiters.remove(me)
+                self._depth[priority].dec()
+                self._cond.notify_all()  # the next waiter may be the head now
+        waited = time.monotonic() - start
+        self._wait[priority].observe(waited)
+        return waited
+
+    def try_acquire(self, tokens: int) -> bool:
+        """Dispatch now if nobody is waiting and the quota allows it (hedged requests)."""
+        with self._cond:
+            now = time.monotonic()
+            if self._waiters or self._ready_in(tokens, now) > 0:
+                return False
+            self._dispatch(tokens, now)
+            return True
+
+    def _dispatch(self, tokens: int, now: float):
+        for quota, bucket in self._buckets.items():
+            bucket.take(1 if quota == "requests" else tokens, now)
+        self._window.append((now, tokens))
+        while self._window and self._window[0][0] < now - 60:
+            self._window.popleft()
+        metrics.counter("llm_estimated_tokens_total").inc(tokens)
+        if self.rpm:
+            self._use["requests"].set(len(self._window) / (self.rpm * self._share))
+        if self.tpm:
+            self._use["tokens"].set(sum(t for _, t in self._window) / (self.tpm * self._share))
+
+    def throttled(self, retry_after: Optional[float] = None):
+        """The provider answered 429: stop dispatching for a while and start from empty buckets."""
+        with self._cond:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + (retry_after or self.burst))
+            for bucket in self._buckets.values():
+                bucket.drain(now)
+        metrics.counter("llm_scheduler_throttled_total").inc()
@@ -0,0 +1,68 @@
+# Second retrieval stage: a small cross-encoder rescores the first stage's
+# candidates for every question of a request in one batch, then each question
+# keeps as many chunks as the score gap and a token budget justify.
+
+import logging, time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+try:
+    import torch
+    from sentence_transformers import CrossEncoder
+    CROSS_ENCODER_AVAILABLE = True
+except ImportError:
+    CROSS_ENCODER_AVAILABLE = False
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1  # ~4 characters per token for English prose
+
+
+class Reranker:
+    def __init__(self, model_name: str, batch_size: int = 32, max_length: int = 512):
+        # Raw logits (no sigmoid) so score gaps are comparable across the range
+        self.model = CrossEncoder(model_name, max_length=max_length,
+                                  default_activation_function=torch.nn.Identity())
+        self.batch_size = batch_size
+
+    def score(self, questions: Sequence[str], candidates: Sequence[Sequence[str]]) -> List[np.ndarray]:
+        """Scores of each question's candidates, computed in a single batched pass."""
+        pairs = [(q, c) for q, cands in zip(questions, candidates) for c in cands]
+        if not pairs:
+            return [np.zeros(0) for _ in questions]
+        start = time.monotonic()
+        flat = np.asarray(self.model.predict(pairs, batch_size=self.batch_size,
+                                             show_progress_bar=False), dtype=np.float32)
+        metrics.histogram("rerank_seconds").observe(time.monotonic() - start)
+        metrics.counter("rerank_pairs_total").inc(len(pairs))
+        out, pos = [], 0
+        for cands in candidates:
+            out.append(flat[pos:pos + len(cands)])
+            pos += len(cands)
+        return out
+
+
+def select_adaptive(candidates: Sequence[str], scores: Optional[np.ndarray], k: int,
+                    token_budget: int, gap: float) -> Tuple[List[str], int]:
+    """Best-first chunks, cut at the first score drop larger than ``gap``, at
+    ``k`` chunks or when ``token_budget`` would be exceeded (the top chunk is
+    always kept). Returns the chunks and their estimated token count."""
+    order = range(len(candidates)) if scores is None else np.argsort(-scores)
+    chosen, tokens, prev = [], 0, None
+    for i in order:
+        if len(chosen) == k:
+            break
+        if scores is not None and prev is not None and prev - scores[i] > gap:
+            break
+        cost = estimate_tokens(candidates[i])
+        if chosen and tokens + cost > token_budget:
+            break
+        chosen.append(candidates[i])
+        tokens += cost
+        prev = None if scores is None else scores[i]
+    return chosen, tokens
@@ -0,0 +1,107 @@
+# Multi-worker serving with a shared model and document cache.
+#
+#   SHM_CACHE_BYTES=2000000000 python serve.py --workers 4 --port 8000
+#
+# Unlike `uvicorn --workers N` (which spawns fresh interpreters that each load
+# their own SentenceTransformer), the model is loaded once here and the
+# workers are forked from this process, sharing its pages copy-on-write.
+# Documents are shared through shm_cache segments; this parent process is the
+# coordinator that evicts them and restarts workers that die.
+
+import argparse, gc, logging, os, signal, socket, sys, threading, time
+
+import uvicorn
+
+import main
+
+logger = logging.getLogger("serve")
+
+
+def run_worker(sock: socket.socket, args):
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if args.torch_threads:
+        import torch
+        torch.set_num_threads(args.torch_threads)
+    main.llm_scheduler.share(1 / args.workers)  # the quotas belong to the API key, not the worker
+    config = uvicorn.Config(main.app, log_level=args.log_level, timeout_keep_alive=5)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def coordinate(stop: threading.Event, interval: float):
+    while not stop.wait(interval):
+        try:
+            main.shared_cache.evict()
+            main.shared_cache.sweep_tmp()
+        except OSError as e:
+            logger.warning(f"Shared cache maintenance failed: {e}")
+
+
+def serve(args):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # Objects allocated so far (the model above all) are moved out of the GC's
+    # generations so collections in the workers do not write to their pages.
+    gc.collect()
+    gc.freeze()
+
+    children, stopping = {}, threading.Event()
+
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(sock, args)
+            finally:
+                os._exit(0)
+        children[pid] = slot
+        logger.info(f"Worker {slot} started (pid {pid})")
+
+    def shutdown(signum, frame):
+        stopping.set()
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    for slot in range(args.workers):
+        spawn(slot)
+    if main.shared_cache:
+        threading.Thread(target=coordinate, args=(stopping, args.evict_interval), daemon=True).start()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        if slot is not None and not stopping.is_set():
+            logger.warning(f"Worker {slot} (pid {pid}) exited with status {status}; restarting")
+            time.sleep(1)
+            spawn(slot)
+
+    if main.shared_cache and not args.keep_cache:
+        main.shared_cache.clear()
+    sock.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Pre-fork server with a shared model and document cache")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--torch-threads", type=int, default=0, help="per-worker torch intra-op threads")
+    ap.add_argument("--evict-interval", type=float, default=5.0)
+    ap.add_argument("--keep-cache", action="store_true", help="leave shared segments for the next start")
+    ap.add_argument("--log-level", default="info")
+    serve(ap.parse_args())
+    sys.exit(0)
@@ -0,0 +1,472 @@
+# Sharded vector search: chunk vectors are partitioned across local shard
+# processes, queries are scattered to the shards in parallel and the per-shard
+# top-k lists are merged. Documents are split into segments of at most
+# ``segment_size`` vectors; each segment lives on one shard and segments move
+# between shards when the load gets uneven.
+#
+# Shards listen on Unix sockets (multiprocessing.connection) in a private
+# directory, so every worker process of serve.py can reach the same shards.
+
+import argparse, atexit, heapq, logging, os, shutil, socket, struct, subprocess, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor, wait
+from multiprocessing.connection import Connection, Listener
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import metrics
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+Hit = Tuple[float, str, int]  # (squared L2 distance, doc_id, chunk index)
+
+
+class ShardTimeout(Exception):
+    pass
+
+
+class ShardRefused(Exception):
+    pass
+
+
+def knn(queries: np.ndarray, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact squared-L2 k nearest neighbours, best first (as faiss.IndexFlatL2)."""
+    k = min(k, len(vectors))
+    if FAISS_AVAILABLE:
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors)
+        return index.search(queries, k)
+    dists = (queries ** 2).sum(1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(1)[None, :]
+    ids = np.argpartition(dists, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(dists, ids, 1).argsort(1)
+    ids = np.take_along_axis(ids, order, 1)
+    return np.take_along_axis(dists, ids, 1), ids
+
+
+class Shard:
+    """The segments held by one shard process, with a flat index over all of
+    them for corpus-wide queries (extended on add, rebuilt after a removal)."""
+
+    def __init__(self):
+        self.segments: Dict[str, Tuple[str, int, np.ndarray]] = {}  # key -> (doc_id, first chunk, vectors)
+        self.by_doc: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        self._index = None
+        self._rows: List[Tuple[str, int]] = []  # index row -> (doc_id, first chunk) of its segment ...
+        self._row_offsets: List[int] = []       # ... and the row where that segment starts
+
+    def add(self, key: str, doc_id: str, start: int, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            if key in self.segments:
+                self._remove(key)
+            self.segments[key] = (doc_id, start, vectors)
+            self.by_doc.setdefault(doc_id, set()).add(key)
+            if self._index is not None:
+                self._append(doc_id, start, vectors)
+
+    def _append(self, doc_id: str, start: int, vectors: np.ndarray):
+        self._row_offsets.append(self._index_size())
+        self._rows.append((doc_id, start))
+        if FAISS_AVAILABLE:
+            self._index.add(vectors)
+        else:
+            self._index = np.vstack([self._index, vectors])
+
+    def _index_size(self) -> int:
+        return self._index.ntotal if FAISS_AVAILABLE else len(self._index)
+
+    def _remove(self, key: str):
+        doc_id, _, _ = self.segments.pop(key)
+        keys = self.by_doc.get(doc_id, set())
+        keys.discard(key)
+        if not keys:
+            self.by_doc.pop(doc_id, None)
+        self._index = None  # rebuilt by the next corpus-wide search
+
+    def remove(self, key: str) -> bool:
+        with self._lock:
+            if key not in self.segments:
+                return False
+            self._remove(key)
+            return True
+
+    def remove_doc(self, doc_id: str) -> int:
+        with self._lock:
+            keys = list(self.by_doc.get(doc_id, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def _build(self):
+        dim = next(iter(self.segments.values()))[2].shape[1]
+        self._index = faiss.IndexFlatL2(dim) if FAISS_AVAILABLE else np.zeros((0, dim), np.float32)
+        self._rows, self._row_offsets = [], []
+        for doc_id, start, vectors in self.segments.values():
+            self._append(doc_id, start, vectors)
+
+    def search(self, queries: np.ndarray, k: int, doc_ids: Optional[Sequence[str]] = None) -> Tuple[List[List[Hit]], int]:
+        """Top ``k`` hits per query (within ``doc_ids`` if given) and the number of vectors searched."""
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        with self._lock:
+            if doc_ids is None:
+                if not self.segments:
+                    return [[] for _ in queries], 0
+                if self._index is None:
+                    self._build()
+                # The shared index is extended in place by add(), so it is searched under the lock
+                index, rows, offsets = self._index, self._rows, list(self._row_offsets)
+                if FAISS_AVAILABLE:
+                    dists, ids = index.search(queries, min(k, index.ntotal))
+                    n = index.ntotal
+                else:
+                    dists, ids = knn(queries, index, k)
+                    n = len(index)
+            else:
+                segs = [self.segments[key] for d in doc_ids for key in self.by_doc.get(d, ())]
+        if doc_ids is not None:
+            # Segment arrays are never modified, so per-document searches run concurrently
+            if not segs:
+                return [[] for _ in queries], 0
+            rows = [(doc_id, start) for doc_id, start, _ in segs]
+            offsets = list(np.cumsum([0] + [len(v) for _, _, v in segs[:-1]]))
+            vectors = segs[0][2] if len(segs) == 1 else np.vstack([v for _, _, v in segs])
+            n = len(vectors)
+            dists, ids = knn(queries, vectors, k)
+        out = []
+        for drow, irow in zip(dists, ids):
+            hits = []
+            for dist, i in zip(drow, irow):
+                if i < 0:
+                    continue
+                seg = int(np.searchsorted(offsets, i, side="right")) - 1
+                doc_id, start = rows[seg]
+                hits.append((float(dist), doc_id, start + int(i) - int(offsets[seg])))
+            out.append(hits)
+        return out, n
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"vectors": sum(len(v) for _, _, v in self.segments.values()),
+                    "segments": {key: len(v) for key, (_, _, v) in self.segments.items()}}
+
+    def handle(self, op: str, *args):
+        if op == "search":
+            return self.search(*args)
+        if op == "add":
+            return self.add(*args)
+        if op == "remove":
+            return self.remove(*args)
+        if op == "remove_doc":
+            return self.remove_doc(*args)
+        if op == "has":
+            return args[0] in self.by_doc
+        if op == "get":
+            return self.segments.get(args[0])
+        if op == "stats":
+            return self.stats()
+        raise ValueError(f"unknown shard op {op!r}")
+
+
+def _serve_connection(shard: Shard, conn):
+    with conn:
+        while True:
+            try:
+                op, *args = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                reply = ("ok", shard.handle(op, *args))
+            except Exception as e:
+                reply = ("error", f"{type(e).__name__}: {e}")
+            try:
+                conn.send(reply)
+            except OSError:
+                return
+
+
+def _exit_with_parent(parent: int):
+    while os.getppid() == parent:
+        time.sleep(1)
+    os._exit(0)
+
+
+def run_shard(address: str, threads: int = 1, parent: Optional[int] = None):
+    """Shard process entry point: serve ``address`` until killed (or ``parent`` exits)."""
+    if FAISS_AVAILABLE and threads:
+        faiss.omp_set_num_threads(threads)
+    if parent:
+        threading.Thread(target=_exit_with_parent, args=(parent,), daemon=True).start()
+    shard = Shard()
+    with Listener(address, family="AF_UNIX", backlog=128) as listener:
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_serve_connection, args=(shard, conn), daemon=True).start()
+
+
+def start_local_shards(n: int, threads: int = 1) -> Tuple[List[str], List[subprocess.Popen]]:
+    """Start ``n`` shard processes on sockets in a fresh private directory.
+
+    They are separate interpreters (not forks: a shard needs numpy and faiss,
+    not a copy of the embedding model) and exit with this process.
+    """
+    directory = tempfile.mkdtemp(prefix="hackrx-shards-")  # mode 0700: only this user can connect
+    addresses, procs = [], []
+    for i in range(n):
+        addresses.append(os.path.join(directory, f"shard-{i}.sock"))
+        procs.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), addresses[-1],
+                                       "--threads", str(threads), "--parent", str(os.getpid())]))
+    owner = os.getpid()
+    atexit.register(lambda: os.getpid() == owner and stop_local_shards(procs, directory))
+    for address, proc in zip(addresses, procs):
+        deadline = time.monotonic() + 30
+        while not os.path.exists(address):
+            if proc.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"shard at {address} did not start")
+            time.sleep(0.05)
+    return addresses, procs
+
+
+def stop_local_shards(procs: Sequence[subprocess.Popen], directory: Optional[str] = None):
+    for proc in procs:
+        if proc.poll() is None:
+            proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class ShardClient:
+    """Connections to one shard, one per concurrent caller. A connection whose
+    reply does not come within the timeout is dropped, so a late reply can
+    never be read as the answer to the next request. The timeout covers
+    connecting and sending too: a hung shard stops accepting and reading.
+    A full listen backlog is retried until the timeout; a shard that does not
+    listen at all, or whose backlog stays full, raises ShardRefused."""
+
+    def __init__(self, address: str):
+        self.address = address
+        self._idle: list = []
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _connect(self, end: Optional[float]) -> Connection:
+        delay = 0.001
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                # Unix sockets connect at once or fail with EAGAIN while the backlog is full
+                sock.setblocking(end is None)
+                sock.connect(self.address)
+                sock.setblocking(True)
+                return Connection(sock.detach())
+            except BlockingIOError as e:
+                sock.close()
+                left = end - time.monotonic()
+                if left <= 0:
+                    raise ShardRefused(f"shard {self.address} backlog stayed full") from e
+                time.sleep(min(delay, left))
+                delay = min(2 * delay, 0.05)
+            except (ConnectionRefusedError, FileNotFoundError) as e:
+                sock.close()
+                raise ShardRefused(f"shard {self.address} is not listening") from e
+            except BaseException:
+                sock.close()
+                raise
+
+    def call(self, op: str, *args, timeout: Optional[float] = None):
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            if self._pid != os.getpid():  # forked (serve.py workers): never share a socket with the parent
+                self._idle, self._pid = [], os.getpid()
+            conn = self._idle.pop() if self._idle else None
+        try:
+            if conn is None:
+                conn = self._connect(end)
+            # A send blocked on a full socket buffer fails with EAGAIN after SO_SNDTIMEO
+            left = 0.0 if end is None else max(end - time.monotonic(), 1e-3)
+            with socket.socket(fileno=os.dup(conn.fileno())) as sock:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO,
+                                struct.pack("ll", int(left), int(left % 1 * 1e6)))
+            conn.send((op, *args))
+            if end is not None and not conn.poll(max(0.0, end - time.monotonic())):
+                raise ShardTimeout(f"shard {self.address} did not answer {op} within {timeout}s")
+            status, value = conn.recv()
+        except (TimeoutError, BlockingIOError) as e:
+            if conn is not None:
+                conn.close()
+            raise ShardTimeout(f"shard {self.address} did not take {op} within {timeout}s") from e
+        except BaseException:
+            if conn is not None:
+                conn.close()
+            raise
+        with self._lock:
+            self._idle.append(conn)
+        if status != "ok":
+            raise RuntimeError(f"shard {self.address}: {value}")
+        return value
+
+
+class ShardedIndex:
+    """Scatter-gather search over shard processes at ``addresses``.
+
+    Vectors of a document are added in segments of ``segment_size`` rows,
+    each to the least loaded shard. After adds and removals, segments are
+    moved from the most to the least loaded shard while their vector counts
+    differ by more than ``imbalance`` of the mean. A shard that does not
+    answer a search within ``timeout`` seconds is left out of the result;
+    one that does not take a segment within it is skipped for the next one.
+    """
+
+    def __init__(self, addresses: Sequence[str], timeout: float = 1.0, segment_size: int = 4096,
+                 imbalance: float = 0.2):
+        self.shards = [ShardClient(a) for a in addresses]
+        self.timeout = timeout
+        self.segment_size = segment_size
+        self.imbalance = imbalance
+        self._pool = ThreadPoolExecutor(max(4, 4 * len(self.shards)), thread_name_prefix="shard")
+        self._rebalance_lock = threading.Lock()
+
+    def _failed(self, i: int, op: str, e: Exception):
+        outcome = ("timeout" if isinstance(e, ShardTimeout) else
+                   "refused" if isinstance(e, ShardRefused) else "error")
+        metrics.counter("shard_failures_total", {"shard": str(i), "outcome": outcome}).inc()
+        logger.warning(f"Shard {i} {op} failed: {e}")
+
+    def _call(self, i: int, op: str, *args):
+        """``op`` on shard ``i`` within the timeout; failures are counted and re-raised."""
+        try:
+            return self.shards[i].call(op, *args, timeout=self.timeout)
+        except Exception as e:
+            self._failed(i, op, e)
+            raise
+
+    def _scatter(self, op: str, *args, timeout: Optional[float] = None) -> List[Tuple[bool, object]]:
+        """``op`` on every shard in parallel: (ok, reply or exception) per shard."""
+        futures = [self._pool.submit(s.call, op, *args, timeout=timeout) for s in self.shards]
+        wait(futures)
+        out = []
+        for i, f in enumerate(futures):
+            try:
+                out.append((True, f.result()))
+            except Exception as e:
+                out.append((False, e))
+                self._failed(i, op, e)
+        return out
+
+    def search(self, queries: np.ndarray, k: int,
+               doc_ids: Optional[Sequence[str]] = None) -> Tuple[List[List[Hit]], int, List[int]]:
+        """Merged top ``k`` hits per query, vectors searched, and the shards that failed or timed out."""
+        start = time.monotonic()
+        replies = self._scatter("search", np.asarray(queries, np.float32), k,
+                                list(doc_ids) if doc_ids is not None else None, timeout=self.timeout)
+        merged: List[List[Hit]] = [[] for _ in range(len(queries))]
+        searched, failed = 0, []
+        for i, (ok, reply) in enumerate(replies):
+            if not ok:
+                failed.append(i)
+                continue
+            hits, n = reply
+            searched += n
+            for q, shard_hits in enumerate(hits):
+                merged[q].extend(shard_hits)
+        for q, hits in enumerate(merged):
+            # A segment caught mid-move can be on two shards for a moment
+            best = {}
+            for dist, doc_id, idx in hits:
+                if (doc_id, idx) not in best or dist < best[(doc_id, idx)]:
+                    best[(doc_id, idx)] = dist
+            merged[q] = heapq.nsmallest(k, ((d, doc, i) for (doc, i), d in best.items()))
+        metrics.histogram("shard_search_seconds").observe(time.monotonic() - start)
+        return merged, searched, failed
+
+    def has(self, doc_id: str) -> bool:
+        return any(ok and reply for ok, reply in self._scatter("has", doc_id, timeout=self.timeout))
+
+    def loads(self) -> List[Optional[Dict[str, int]]]:
+        """Segment sizes per shard (None for a shard that did not answer)."""
+        return [reply["segments"] if ok else None for ok, reply in self._scatter("stats", timeout=self.timeout)]
+
+    def add(self, doc_id: str, embeddings: np.ndarray):
+        """Place ``doc_id``'s vectors on the shards (a no-op if they are already there)."""
+        if len(embeddings) == 0 or self.has(doc_id):
+            return
+        loads = self.loads()
+        totals = [sum(l.values()) if l is not None else None for l in loads]
+        for start in range(0, len(embeddings), self.segment_size):
+            vectors = np.asarray(embeddings[start:start + self.segment_size], np.float32)
+            while True:
+                live = [(t, i) for i, t in enumerate(totals) if t is not None]
+                if not live:
+                    raise ShardTimeout(f"no shard took {doc_id}:{start}")
+                target = min(live)[1]
+                try:
+                    self._call(target, "add", f"{doc_id}:{start}", doc_id, start, vectors)
+                except Exception:
+                    totals[target] = None  # a shard that failed once is not tried again for this document
+                    continue
+                totals[target] += len(vectors)
+                break
+        self.rebalance()
+
+    def remove(self, doc_id: str):
+        self._scatter("remove_doc", doc_id, timeout=self.timeout)
+        self.rebalance()
+
+    def rebalance(self) -> int:
+        """Move segments from the most to the least loaded shard until balanced; returns moves made."""
+        if len(self.shards) < 2 or not self._rebalance_lock.acquire(blocking=False):
+            return 0
+        try:
+            loads = self.loads()
+            live = [i for i, l in enumerate(loads) if l is not None]
+            totals = {i: sum(loads[i].values()) for i in live}
+            moves = 0
+            while len(live) > 1:
+                hi, lo = max(live, key=totals.get), min(live, key=totals.get)
+                gap = totals[hi] - totals[lo]
+                if gap <= self.imbalance * max(1.0, sum(totals.values()) / len(live)):
+                    break
+                # The segment that best halves the gap, if any makes it smaller
+                movable = [(key, size) for key, size in loads[hi].items() if size < gap]
+                if not movable:
+                    break
+                key, size = min(movable, key=lambda ks: abs(ks[1] - gap / 2))
+                try:
+                    segment = self._call(hi, "get", key)
+                    if segment is not None:
+                        self._call(lo, "add", key, *segment)  # added before removed: never missing
+                        self._call(hi, "remove", key)
+                except Exception:
+                    break  # retried after the next add or removal
+                if segment is not None:
+                    loads[lo][key] = size
+                    totals[lo] += size
+                    moves += 1
+                loads[hi].pop(key)
+                totals[hi] -= size
+            if moves:
+                metrics.counter("shard_rebalance_moves_total").inc(moves)
+                logger.info(f"Rebalanced shards with {moves} segment move(s): {totals}")
+            return moves
+        finally:
+            self._rebalance_lock.release()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Run one vector shard on a Unix socket")
+    ap.add_argument("address")
+    ap.add_argument("--threads", type=int, default=1, help="faiss OpenMP threads")
+    ap.add_argument("--parent", type=int, help="exit when this process does")
+    args = ap.parse_args()
+    run_shard(args.address, args.threads, args.parent)
@@ -0,0 +1,199 @@
+# Cross-process document cache: each document is published once as a
+# read-only segment file on tmpfs (/dev/shm) and mmap'd by every worker, so
+# embeddings, chunks and page texts exist once in RAM however many workers run.
+
+import fcntl, json, logging, mmap, os, struct, tempfile, time
+from collections.abc import Sequence
+from typing import List, Optional
+
+import numpy as np
+
+from doc_store import IngestedDocument
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"HXDOC001"
+ALIGN = 64
+
+
+def default_dir() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "hackrx-docs")
+
+
+class SharedStrings(Sequence):
+    """Read-only list of strings decoded lazily from a shared buffer."""
+
+    def __init__(self, buf, offsets: np.ndarray, data_off: int):
+        self._buf = buf
+        self._offsets = offsets
+        self._data_off = data_off
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        lo, hi = self._offsets[i], self._offsets[i + 1]
+        return self._buf[self._data_off + lo:self._data_off + hi].decode("utf-8", "surrogatepass")
+
+
+def _pad(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _string_table(strings) -> tuple:
+    blobs = [s.encode("utf-8", "surrogatepass") for s in strings]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in blobs], out=offsets[1:])
+    return offsets, b"".join(blobs)
+
+
+class SharedDocumentCache:
+    """Segments live in ``directory`` as ``<doc_id>.seg``; a segment's mtime is its last use.
+
+    Any process may publish or attach. Eviction (``evict``) unlinks the least
+    recently used segments beyond ``max_bytes``; processes that still map an
+    evicted segment keep a valid view until they drop it.
+    """
+
+    def __init__(self, max_bytes: int, directory: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.directory = directory or default_dir()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, doc_id: str) -> str:
+        return os.path.join(self.directory, f"{doc_id}.seg")
+
+    def touch(self, doc_id: str) -> bool:
+        """Mark a segment as recently used; False if it has been evicted."""
+        try:
+            os.utime(self._path(doc_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def publish(self, doc: IngestedDocument) -> IngestedDocument:
+        """Write ``doc`` to a segment (if absent) and return a view backed by it."""
+        path = self._path(doc.doc_id)
+        embs = np.ascontiguousarray(doc.embeddings, dtype=np.float32)
+        if embs.ndim != 2:
+            return doc  # nothing to share (no chunks)
+        if not os.path.exists(path):
+            chunk_offsets, chunk_data = _string_table(doc.chunks)
+            page_offsets, page_data = _string_table(doc.page_texts)
+            sections = [embs.tobytes(), chunk_offsets.tobytes(), chunk_data,
+                        page_offsets.tobytes(), page_data]
+            header = {"doc_id": doc.doc_id, "pages": doc.pages, "source": doc.source,
+                      "created_at": doc.created_at, "page_hashes": doc.page_hashes, "aliases": doc.aliases,
+                      "shape": list(embs.shape), "chunks": len(doc.chunks), "page_texts": len(doc.page_texts),
+                      "sizes": [len(s) for s in sections]}
+            head = json.dumps(header).encode()
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(MAGIC + struct.pack("<Q", len(head)) + head)
+                for s in sections:
+                    f.write(b"\0" * (_pad(f.tell()) - f.tell()))
+                    f.write(s)
+            os.rename(tmp, path)
+            self.evict()
+        return self.attach(doc.doc_id) or doc
+
+    def attach(self, doc_id: str) -> Optional[IngestedDocument]:
+        path = self._path(doc_id)
+        try:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)  # mtime is the LRU clock
+        except (FileNotFoundError, ValueError):
+            return None
+        if mm[:8] != MAGIC:
+            return None
+        (head_len,) = struct.unpack("<Q", mm[8:16])
+        header = json.loads(mm[16:16 + head_len])
+        offs, pos = [], 16 + head_len
+        for size in header["sizes"]:
+            pos = _pad(pos)
+            offs.append(pos)
+            pos += size
+        rows, dim = header["shape"]
+        embs = np.frombuffer(mm, dtype=np.float32, count=rows * dim, offset=offs[0]).reshape(rows, dim)
+        chunks = SharedStrings(mm, np.frombuffer(mm, np.int64, header["chunks"] + 1, offs[1]), offs[2])
+        pages = SharedStrings(mm, np.frombuffer(mm, np.int64, header["page_texts"] + 1, offs[3]), offs[4])
+        # The raw matrix doubles as the (brute-force) index so no worker copies it into FAISS
+        doc = IngestedDocument(doc_id, chunks, embs, embs, header["pages"], source=header["source"],
+                               page_hashes=header["page_hashes"], page_texts=pages,
+                               aliases={int(k): v for k, v in header.get("aliases", {}).items()})
+        doc.created_at = header["created_at"]
+        doc.shared = True
+        return doc
+
+    def list(self) -> List[dict]:
+        metas = []
+        for _, _, doc_id in self.segments():
+            try:
+                with open(self._path(doc_id), "rb") as f:
+                    if f.read(8) != MAGIC:
+                        continue
+                    (head_len,) = struct.unpack("<Q", f.read(8))
+                    h = json.loads(f.read(head_len))
+            except (FileNotFoundError, ValueError):
+                continue
+            metas.append({"doc_id": doc_id, "pages": h["pages"], "chunks": h["chunks"],
+                          "source": h["source"], "created_at": h["created_at"]})
+        return metas
+
+    def segments(self) -> List[tuple]:
+        out = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".seg"):
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                out.append((st.st_mtime, st.st_size, name[:-4]))
+        return sorted(out)
+
+    def evict(self) -> int:
+        """Unlink least recently used segments until the total fits in ``max_bytes``."""
+        with open(os.path.join(self.directory, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            segs = self.segments()
+            total, removed = sum(s[1] for s in segs), 0
+            for _, size, doc_id in segs:
+                if total <= self.max_bytes:
+                    break
+                self.remove(doc_id)
+                total -= size
+                removed += 1
+        if removed:
+            logger.info(f"Evicted {removed} shared document segment(s)")
+        return removed
+
+    def remove(self, doc_id: str) -> bool:
+        try:
+            os.unlink(self._path(doc_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def clear(self):
+        for _, _, doc_id in self.segments():
+            self.remove(doc_id)
+
+    def sweep_tmp(self, max_age: float = 3600.0):
+        # Half-written segments from workers that died mid-publish
+        now = time.time()
+        for name in os.listdir(self.directory):
+            full = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                try:
+                    if now - os.stat(full).st_mtime > max_age:
+                        os.unlink(full)
+                except FileNotFoundError:
+                    pass
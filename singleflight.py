@@ -0,0 +1,83 @@
+# In-flight call coalescing: concurrent callers with the same key share one
+# execution of the work instead of each repeating it.
+
+import threading, time
+from typing import Any, Callable, Dict, Optional
+
+import metrics
+
+
+class FlightTimeout(Exception):
+    pass
+
+
+class _Call:
+    __slots__ = ("done", "result", "exc", "private", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.exc: Optional[BaseException] = None
+        self.private = False
+        self.waiters = 0
+
+
+class SingleFlight:
+    """The first caller for a key runs ``fn``; callers arriving while it runs
+    block on the same outcome and receive its result or its exception.
+
+    A waiter that gives up (``timeout``) leaves the leader running for the
+    others. ``accept`` lets a waiter reject a shared result (for instance one
+    cut short by the leader's own deadline) and run the work itself.
+    ``private`` is asked by the leader whether its exception is its own (its
+    tenant's admission, its deadline) rather than the work's: waiters then
+    retry with their own instead of receiving it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._coalesced = metrics.counter("singleflight_coalesced_total", {"flight": name})
+        self._leaders = metrics.counter("singleflight_leader_total", {"flight": name})
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None,
+           accept: Optional[Callable[[Any], bool]] = None,
+           private: Optional[Callable[[BaseException], bool]] = None) -> Any:
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                else:
+                    call.waiters += 1
+            if leader:
+                self._leaders.inc()
+                try:
+                    call.result = fn()
+                    return call.result
+                except BaseException as e:
+                    call.exc = e
+                    call.private = bool(private and private(e))
+                    raise
+                finally:
+                    with self._lock:
+                        del self._calls[key]
+                    call.done.set()
+
+            self._coalesced.inc()
+            left = None if end is None else max(0.0, end - time.monotonic())
+            if not call.done.wait(left):
+                raise FlightTimeout(f"timed out waiting for an in-flight {self.name}")
+            if call.exc is not None:
+                if call.private:
+                    metrics.counter("singleflight_retried_total", {"flight": self.name}).inc()
+                    continue
+                raise call.exc
+            if accept is None or accept(call.result):
+                return call.result
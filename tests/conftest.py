@@ -0,0 +1,47 @@
+# Tests run offline: the embedding model is replaced by a deterministic stub
+# before main is imported, and the reranker is disabled.
+
+import hashlib, os, sys, tempfile, types
+
+import numpy as np
+import pytest
+
+
+class StubEmbedder:
+    """Unit vectors seeded by the text, so equal texts embed equally."""
+
+    dim = 32
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts, **kwargs):
+        batch = [texts] if isinstance(texts, str) else list(texts)
+        out = np.zeros((len(batch), self.dim), np.float32)
+        for i, text in enumerate(batch):
+            seed = int.from_bytes(hashlib.sha1(text.encode("utf-8", "surrogatepass")).digest()[:8], "big")
+            out[i] = np.random.default_rng(seed).standard_normal(self.dim)
+        out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out[0] if isinstance(texts, str) else out
+
+
+try:
+    import sentence_transformers
+except ImportError:
+    sentence_transformers = sys.modules["sentence_transformers"] = types.ModuleType("sentence_transformers")
+sentence_transformers.SentenceTransformer = StubEmbedder
+os.environ["RERANK_MODEL"] = ""
+os.environ.setdefault("JOB_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="hackrx-tests-"), "jobs.db"))
+
+
+@pytest.fixture(scope="session")
+def app():
+    """The main module, or a skip where its other dependencies are missing."""
+    try:
+        import main
+    except Exception as e:
+        pytest.skip(f"main cannot be imported here: {e}")
+    return main
@@ -0,0 +1,13 @@
+# Bulk ingestion keys signed URLs without their query but still fetches them signed.
+
+from bulk_ingest import collect
+
+
+def test_signed_urls_keep_their_query_for_fetching(tmp_path):
+    signed = "https://example.blob.core.windows.net/assets/policy.pdf?sv=2023-01-03&sig=abc"
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text(f"{signed}\n{signed.split('?')[0]}?sv=2023-01-03&sig=def\nlocal.pdf\n")
+    assert collect([str(manifest)]) == [
+        (str(tmp_path / "local.pdf"), str(tmp_path / "local.pdf")),
+        ("https://example.blob.core.windows.net/assets/policy.pdf", signed),
+    ]
@@ -0,0 +1,42 @@
+# Documents that share a source (a URL without its query string) are only
+# retired when the caller asks for it.
+
+import numpy as np
+
+from doc_store import DocumentStore, IngestedDocument
+
+
+def doc(doc_id: str, previous: str = None) -> IngestedDocument:
+    return IngestedDocument(doc_id, ["text"], np.ones((1, 4), np.float32), None, 1,
+                            source="https://example.com/policy.pdf",
+                            stats={"previous_doc_id": previous} if previous else None)
+
+
+def test_same_source_keeps_the_other_document(tmp_path):
+    store = DocumentStore(lambda e: e, directory=str(tmp_path))
+    store.put(doc("aaa"))
+    store.put(doc("bbb", previous="aaa"))
+    assert store.get("aaa") is not None
+    assert store.latest_for("https://example.com/policy.pdf").doc_id == "bbb"
+
+
+def test_replace_retires_the_previous_version(tmp_path):
+    store = DocumentStore(lambda e: e, directory=str(tmp_path))
+    deleted = []
+    store.on_delete.append(deleted.append)
+    store.put(doc("aaa"))
+    new = doc("bbb", previous="aaa")
+    store.put(new)
+    assert store.retire_previous(new) == "aaa"
+    assert store.get("aaa") is None and deleted == ["aaa"]
+
+
+def test_delete_needs_every_owner_to_let_go(tmp_path):
+    store = DocumentStore(lambda e: e, directory=str(tmp_path))
+    store.put(doc("aaa"))
+    store.claim("aaa", "tenant1")
+    store.claim("aaa", "tenant2")
+    reopened = DocumentStore(lambda e: e, directory=str(tmp_path))
+    assert reopened.owners("aaa") == {"tenant1", "tenant2"}
+    assert reopened.disown("aaa", "tenant1") == {"tenant2"}
+    assert store.owners("bbb") == set()
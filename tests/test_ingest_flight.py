@@ -0,0 +1,37 @@
+# Coalesced ingests must not inherit another tenant's admission or deadline failure.
+
+import contextlib, threading, time
+from types import SimpleNamespace
+
+from admission import QueueTimeout
+from deadline import Deadline
+
+
+def test_waiter_outlives_leader_queue_timeout(app, monkeypatch):
+    doc = SimpleNamespace(doc_id="ab", truncated=False)
+    monkeypatch.setattr(app.doc_proc, "fetch_pdf", lambda url, deadline: contextlib.nullcontext(SimpleNamespace(sha256="ab")))
+    monkeypatch.setattr(app, "ingest_content", lambda load, doc_id, deadline, source: doc)
+
+    # Every ingest slot is busy, so both tenants queue behind them
+    held = [app.ingest_gate.acquire("other") for _ in range(app.ingest_gate.capacity)]
+    results = {}
+
+    def run(tenant, deadline):
+        try:
+            results[tenant] = app.ingest_document("https://example.com/a.pdf", deadline, tenant)
+        except Exception as e:
+            results[tenant] = e
+
+    hurried = threading.Thread(target=run, args=("hurried", Deadline(0.5)))
+    patient = threading.Thread(target=run, args=("patient", Deadline()))
+    hurried.start()
+    time.sleep(0.1)  # the hurried tenant leads the flight
+    patient.start()
+    time.sleep(1.0)
+    for acquired_at in held:
+        app.ingest_gate.release(acquired_at)
+    hurried.join(5)
+    patient.join(5)
+
+    assert isinstance(results["hurried"], QueueTimeout)
+    assert results["patient"] is doc
@@ -0,0 +1,41 @@
+# Job recovery must only take over jobs whose worker is gone.
+
+import os, time
+
+from jobs import JobStore
+
+
+def test_recover_leaves_live_jobs_alone(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    live, dead, stale = (store.submit("t", {"n": i}) for i in range(3))
+    for _ in range(3):
+        store.claim()
+    db = store._conn()
+    db.execute("UPDATE jobs SET owner = ? WHERE id = ?", (f"{store.owner.rsplit(':', 2)[0]}:999999:x", dead))
+    db.execute("UPDATE jobs SET owner = 'elsewhere:1:x', updated_at = ? WHERE id = ?", (time.time() - 600, stale))
+
+    assert store.recover(max_attempts=3, lease_s=300) == 2
+    assert [store.get(j)["status"] for j in (live, dead, stale)] == ["running", "queued", "queued"]
+    store.finish(live, result={})
+    assert store.get(live)["status"] == "done"
+
+
+def test_restarted_process_with_same_pid_recovers_its_jobs(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    before = JobStore(path)
+    job = before.submit("t", {})
+    before.claim()
+    assert JobStore(path).recover(max_attempts=3, lease_s=300) == 1
+    assert before.get(job)["status"] == "queued"
+
+
+def test_forked_process_opens_its_own_connection(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    parent = store._conn()
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write, b"1" if store._conn() is not parent and store.depth() == 0 else b"0")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read, 1) == b"1"
@@ -0,0 +1,89 @@
+# ResilientLLMClient against a scripted local backend: retries, hedging and
+# circuit breaker transitions.
+
+import threading, time
+
+import pytest
+
+from llm_client import CircuitBreaker, CircuitOpenError, LLMError, ResilientLLMClient
+
+
+class BackendError(Exception):
+    def __init__(self, code: int):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class StubBackend:
+    """Plays ``script`` one call at a time: an int status raises, a float sleeps then answers."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt: str, timeout: float) -> str:
+        with self._lock:
+            step = self.script[self.calls] if self.calls < len(self.script) else 0.0
+            self.calls += 1
+        if isinstance(step, int):
+            raise BackendError(step)
+        time.sleep(step)
+        return f"answer to {prompt}"
+
+
+def client(backend, **kw) -> ResilientLLMClient:
+    return ResilientLLMClient(backend, timeout=2.0, backoff_base=0.01, **kw)
+
+
+def test_retryable_errors_are_retried():
+    backend = StubBackend(503, 429, 0.0)
+    assert client(backend).generate("q") == "answer to q"
+    assert backend.calls == 3
+
+
+def test_non_retryable_error_is_not_retried():
+    backend = StubBackend(400)
+    with pytest.raises(LLMError):
+        client(backend).generate("q")
+    assert backend.calls == 1
+
+
+def test_hedge_wins_over_a_slow_first_call():
+    backend = StubBackend(*[0.0] * 5, 1.5, 0.0)
+    llm = client(backend, hedge=True, hedge_min_samples=5)
+    for _ in range(5):
+        llm.generate("warm")
+    start = time.monotonic()
+    assert llm.generate("q") == "answer to q"
+    assert time.monotonic() - start < 1.0
+    assert backend.calls == 7
+
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    backend = StubBackend(503, 503)
+    llm = client(backend, breaker=breaker, max_attempts=2)
+    with pytest.raises(LLMError):
+        llm.generate("q")
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        llm.generate("q")
+    assert backend.calls == 2
+    time.sleep(0.25)
+    assert llm.generate("q") == "answer to q"
+    assert breaker.state == "closed"
+
+
+def test_caller_error_during_probe_keeps_the_breaker_half_open():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    backend = StubBackend(503, 400, 0.0)
+    llm = client(backend, breaker=breaker, max_attempts=1)
+    with pytest.raises(LLMError):
+        llm.generate("q")
+    time.sleep(0.15)
+    with pytest.raises(LLMError):
+        llm.generate("bad")
+    assert breaker.state == "half_open"
+    assert llm.generate("q") == "answer to q"
+    assert breaker.state == "closed"
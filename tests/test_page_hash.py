@@ -0,0 +1,51 @@
+# Page hashes must change when the text drawn through a page's resources does.
+
+from types import SimpleNamespace
+
+import PyPDF2
+from pdf_buffer import BufferReader
+
+
+def pdf(forms: list) -> bytes:
+    """One page per form XObject text, each page drawing its form with the same content stream."""
+    objs = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+            "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    content = b"q /Fm0 Do Q"
+    objs.append(f"<< /Length {len(content)} >>\nstream\n{content.decode()}\nendstream")
+    kids = []
+    for text in forms:
+        form = f"BT /F1 10 Tf 50 700 Td ({text}) Tj ET"
+        objs.append(f"<< /Type /XObject /Subtype /Form /BBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> "
+                    f"/Length {len(form)} >>\nstream\n{form}\nendstream")
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                    f"/Resources << /XObject << /Fm0 {len(objs)} 0 R >> >> /Contents 4 0 R >>")
+        kids.append(f"{len(objs)} 0 R")
+    objs[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for i, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def test_form_xobject_text_changes_the_hash(app):
+    pages = PyPDF2.PdfReader(BufferReader(pdf(["Grace period 30 days", "Grace period 15 days",
+                                               "Grace period 30 days"]))).pages
+    memo = {}
+    first, second, third = (app.doc_proc.page_hash(p, memo) for p in pages)
+    assert first != second
+    assert first == third
+
+
+def test_pages_are_only_parsed_for_hashes_against_a_known_version(app, monkeypatch):
+    data = pdf(["Grace period 30 days", "Grace period 15 days"])
+    opened = []
+    monkeypatch.setattr(app, "PyPDF2", SimpleNamespace(PdfReader=lambda *a: opened.append(1) or PyPDF2.PdfReader(*a)))
+    app.doc_proc.extract_pages(data)
+    assert opened == []
+    texts, hashes = app.doc_proc.extract_pages(data, known={"none": "x"})
+    assert opened == [1] and hashes[0] != hashes[1]
@@ -0,0 +1,30 @@
+# The scheduler's pacing must keep every 60-second window within the quota.
+
+from rate_limit import RateLimiter
+
+
+def busiest_minute(bucket, horizon: float = 1800.0) -> int:
+    """Requests in the fullest 60-second window when calls go out as soon as the bucket allows."""
+    bucket.level, bucket._at = bucket.capacity, 0.0
+    sent, now = [], 0.0
+    while now < horizon:
+        now += bucket.wait_time(1, now)
+        bucket.take(1, now)
+        sent.append(now)
+    return max(sum(1 for u in sent if t <= u <= t + 60) for t in sent)
+
+
+def test_shares_stay_within_the_quota():
+    for rpm, workers in ((15, 8), (60, 1), (10, 4), (100, 3)):
+        limiter = RateLimiter(rpm=rpm)
+        limiter.share(1 / workers)
+        assert workers * busiest_minute(limiter._buckets["requests"]) <= rpm, (rpm, workers)
+
+
+def test_share_below_two_per_minute_still_flows():
+    limiter = RateLimiter(rpm=15)
+    limiter.share(1 / 8)  # 1.875 requests per minute
+    bucket = limiter._buckets["requests"]
+    assert bucket.capacity < 1
+    assert busiest_minute(bucket) == 1
+    assert bucket.rate * 60 >= 0.9
@@ -0,0 +1,35 @@
+# Shard calls under load and with a hung shard.
+
+import os, signal, time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from shards import ShardClient, ShardedIndex, start_local_shards, stop_local_shards
+
+
+def test_concurrent_connects_to_a_live_shard():
+    addresses, procs = start_local_shards(1)
+    try:
+        clients = [ShardClient(addresses[0]) for _ in range(64)]  # every call opens a fresh connection
+        with ThreadPoolExecutor(64) as pool:
+            replies = list(pool.map(lambda c: c.call("stats", timeout=2.0), clients))
+        assert all("segments" in r for r in replies)
+    finally:
+        stop_local_shards(procs, os.path.dirname(addresses[0]))
+
+
+def test_add_skips_a_hung_shard():
+    addresses, procs = start_local_shards(2)
+    try:
+        index = ShardedIndex(addresses, timeout=0.5, segment_size=10)
+        os.kill(procs[0].pid, signal.SIGSTOP)
+        start = time.monotonic()
+        index.add("doc", np.random.default_rng(0).standard_normal((30, 8)).astype(np.float32))
+        assert time.monotonic() - start < 5
+        assert sum(index.shards[1].call("stats", timeout=5.0)["segments"].values()) == 30
+        hits, searched, failed = index.search(np.zeros((1, 8), np.float32), 3, ["doc"])
+        assert searched == 30 and failed == [0]
+    finally:
+        os.kill(procs[0].pid, signal.SIGCONT)
+        stop_local_shards(procs, os.path.dirname(addresses[0]))
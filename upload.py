@@ -0,0 +1,139 @@
+# Streaming multipart upload: the file part of the body is spooled (in memory,
+# then to a temp file) and hashed as it arrives, so a document uploaded by the
+# client is never buffered whole in memory or transferred twice.
+
+import hashlib
+from typing import Dict, List, Optional
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+from pdf_buffer import PdfBuffer
+
+
+class UploadError(Exception):
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+class ReceivedUpload:
+    """The file part is kept in memory up to ``spool_bytes``, then in a PdfBuffer temp file."""
+
+    def __init__(self, spool_bytes: int, directory: Optional[str] = None):
+        self.spool_bytes = spool_bytes
+        self.directory = directory
+        self._memory = bytearray()
+        self._disk: Optional[PdfBuffer] = None
+        self.filename: Optional[str] = None
+        self.size = 0
+        self.sha256 = None  # hex digest once the body is complete
+        self.fields: Dict[str, List[str]] = {}
+
+    def write(self, chunk: bytes):
+        if self._disk is None and len(self._memory) + len(chunk) > self.spool_bytes:
+            self._disk = PdfBuffer(self.directory, hashed=False)
+            self._disk.write(bytes(self._memory))
+            self._memory = bytearray()
+        if self._disk is not None:
+            self._disk.write(chunk)
+        else:
+            self._memory += chunk
+
+    def buffer(self) -> PdfBuffer:
+        """The file as a finished PdfBuffer (a still in-memory spool is written to disk first)."""
+        if self._disk is None:
+            self._disk = PdfBuffer(self.directory, hashed=False)
+            self._disk.write(bytes(self._memory))
+            self._memory = bytearray()
+        if self._disk.map is None:
+            self._disk.finish()
+            self._disk.sha256 = self.sha256
+        return self._disk
+
+    def close(self):
+        self._memory = bytearray()
+        if self._disk is not None:
+            self._disk.close()
+
+
+async def receive_upload(request, max_bytes: int, spool_bytes: int = 8 << 20, directory: Optional[str] = None,
+                         file_field: str = "file", max_field_bytes: int = 1 << 20) -> ReceivedUpload:
+    """Parse a multipart/form-data request body incrementally.
+
+    The ``file_field`` part is streamed into ``upload`` (in memory up to
+    ``spool_bytes``, then on disk in ``directory``) while its SHA-256 is computed; other parts
+    are collected as text fields. Raises UploadError (413 once the file
+    exceeds ``max_bytes``).
+    """
+    ctype, params = parse_options_header(request.headers.get("content-type", ""))
+    if ctype != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError("Expected a multipart/form-data body", 415)
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > max_bytes + max_field_bytes:
+        raise UploadError(f"Upload larger than {max_bytes} bytes", 413)
+
+    upload = ReceivedUpload(spool_bytes, directory)
+    digest = hashlib.sha256()
+    part: dict = {}
+    field_bytes = 0
+
+    def on_part_begin():
+        part.update(headers={}, field=b"", value=b"", name=None, is_file=False, buf=[])
+
+    def on_header_field(data, start, end):
+        part["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part["field"], part["value"] = b"", b""
+
+    def on_headers_finished():
+        _, disp = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        part["name"] = disp.get(b"name", b"").decode("utf-8", "replace")
+        part["is_file"] = part["name"] == file_field
+        if part["is_file"]:
+            filename = disp.get(b"filename")
+            upload.filename = filename.decode("utf-8", "replace") if filename else None
+
+    def on_part_data(data, start, end):
+        nonlocal field_bytes
+        chunk = data[start:end]
+        if part["is_file"]:
+            upload.size += len(chunk)
+            if upload.size > max_bytes:
+                raise UploadError(f"Upload larger than {max_bytes} bytes", 413)
+            digest.update(chunk)
+            upload.write(chunk)
+        else:
+            field_bytes += len(chunk)
+            if field_bytes > max_field_bytes:
+                raise UploadError("Form fields too large", 413)
+            part["buf"].append(chunk)
+
+    def on_part_end():
+        if part.get("name") and not part["is_file"]:
+            value = b"".join(part["buf"]).decode("utf-8", "replace")
+            upload.fields.setdefault(part["name"], []).append(value)
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin, "on_part_data": on_part_data, "on_part_end": on_part_end,
+        "on_header_field": on_header_field, "on_header_value": on_header_value,
+        "on_header_end": on_header_end, "on_headers_finished": on_headers_finished})
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+    except UploadError:
+        upload.close()
+        raise
+    except Exception as e:
+        upload.close()
+        raise UploadError(f"Malformed multipart body: {e}")
+    if not upload.size:
+        upload.close()
+        raise UploadError(f"Missing '{file_field}' part")
+    upload.sha256 = digest.hexdigest()
+    return upload
@@ -0,0 +1,160 @@
+# Document access frequencies, and warming the most used documents into the
+# cache at startup (or on a schedule) so a rollout does not start cold.
+
+import logging, math, os, sqlite3, threading, time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS doc_access (
+    doc_id TEXT PRIMARY KEY,
+    source TEXT,
+    score REAL NOT NULL,           -- decayed access count as of last_access
+    hits INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+"""
+
+
+class AccessLog:
+    """Per-document access counts in SQLite, decayed so that an access counts
+    half after every ``half_life`` seconds. Accesses are buffered in memory
+    and written at most every ``flush_every`` seconds."""
+
+    def __init__(self, path: str, half_life: float = 7 * 86400.0, flush_every: float = 30.0):
+        self.path = path
+        self.half_life = half_life
+        self.flush_every = flush_every
+        self._local = threading.local()
+        self._pending: Dict[str, Tuple[Optional[str], float, int, float]] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._conn().executescript(SCHEMA)
+
+    def _decay(self, score: float, since: float, now: float) -> float:
+        return score * math.pow(0.5, max(0.0, now - since) / self.half_life)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # A connection inherited through fork (serve.py workers) must not be reused
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.create_function("decay", 3, self._decay, deterministic=True)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def record(self, doc_id: str, source: Optional[str] = None):
+        now = time.time()
+        with self._lock:
+            _, score, hits, last = self._pending.get(doc_id, (None, 0.0, 0, now))
+            self._pending[doc_id] = (source, self._decay(score, last, now) + 1.0, hits + 1, now)
+            due = time.monotonic() - self._last_flush >= self.flush_every
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        try:
+            self._conn().executemany(
+                "INSERT INTO doc_access (doc_id, source, score, hits, last_access) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(doc_id) DO UPDATE SET "
+                "score = decay(score, last_access, excluded.last_access) + excluded.score, "
+                "hits = hits + excluded.hits, last_access = excluded.last_access, "
+                "source = COALESCE(excluded.source, source)",
+                [(d, *v) for d, v in pending.items()])
+        except sqlite3.Error as e:
+            logger.warning(f"Access log write failed: {e}")
+
+    def forget(self, doc_id: str):
+        with self._lock:
+            self._pending.pop(doc_id, None)
+        try:
+            self._conn().execute("DELETE FROM doc_access WHERE doc_id = ?", (doc_id,))
+        except sqlite3.Error as e:
+            logger.warning(f"Access log delete failed for {doc_id}: {e}")
+
+    def top(self, n: int) -> List[dict]:
+        """The ``n`` most accessed documents, hottest first, one per source."""
+        self.flush()
+        rows = self._conn().execute(
+            "SELECT doc_id, source, decay(score, last_access, ?) AS score, hits FROM doc_access "
+            "ORDER BY 3 DESC", (time.time(),))
+        out, sources = [], set()
+        for row in rows:
+            if row["source"] and row["source"] in sources:
+                continue  # an older version of a document already listed
+            sources.add(row["source"])
+            out.append(dict(row))
+            if len(out) >= n:
+                break
+        return out
+
+
+class Warmer:
+    """Loads the ``top_n`` documents of ``access_log`` with ``warm(entry)`` on a
+    background thread, at start and then every ``every`` seconds (0: once).
+
+    Documents are loaded coldest first so the hottest end up most recently
+    used in the LRU. Before each one the warmer waits while ``busy()`` says
+    live traffic is running, and it pauses ``pause`` seconds between them.
+    ``ready`` is set once the first pass is over.
+    """
+
+    def __init__(self, access_log: AccessLog, warm: Callable[[dict], str], top_n: int,
+                 busy: Callable[[], bool] = lambda: False, pause: float = 0.5, every: float = 0.0):
+        self.access_log = access_log
+        self.warm = warm
+        self.top_n = top_n
+        self.busy = busy
+        self.pause = pause
+        self.every = every
+        self.ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.warm_once()
+            except Exception as e:
+                logger.warning(f"Cache warming failed: {e}")
+            self.ready.set()
+            if not self.every or self._stop.wait(self.every):
+                return
+
+    def warm_once(self) -> Dict[str, int]:
+        start, outcomes = time.monotonic(), {}
+        for entry in reversed(self.access_log.top(self.top_n)):
+            while self.busy():
+                if self._stop.wait(self.pause):
+                    return outcomes
+            try:
+                outcome = self.warm(entry)
+            except Exception as e:
+                logger.warning(f"Could not warm {entry['doc_id']} ({entry.get('source')}): {e}")
+                outcome = "error"
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            metrics.counter("warm_documents_total", {"outcome": outcome}).inc()
+            if self._stop.wait(self.pause):
+                break
+        metrics.histogram("warm_pass_seconds").observe(time.monotonic() - start)
+        logger.info(f"Cache warming pass: {outcomes or 'nothing to warm'} in {time.monotonic() - start:.1f}s")
+        return outcomes